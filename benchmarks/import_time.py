@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+'''
+Measure the import time of every `mypielib` module
+
+Each module is imported in a fresh interpreter with `-X importtime`
+and the cumulative time reported for the module is recorded:
+
+- `cold`: the package is copied to a temporary directory without
+  byte code, so the modules are compiled on import.
+- `warm`: imported from the source tree with the byte code cached.
+
+Results are written as JSON.  The exit status is non-zero if the
+warm import time of any module exceeds its budget, as configured
+in `import_budget.json`.
+
+Usage:
+
+```bash
+python3 benchmarks/import_time.py [--output results.json] [--budget import_budget.json]
+```
+'''
+import argparse
+import json
+import os
+import pkgutil
+import shutil
+import subprocess
+import sys
+import tempfile
+
+TOPDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PACKAGE = 'mypielib'
+EXCLUDE = {'_version'}
+
+def list_modules(pkgdir:str) -> list[str]:
+  '''List the modules in the package'''
+  return [PACKAGE] + [f'{PACKAGE}.{mod.name}'
+                      for mod in pkgutil.iter_modules([pkgdir])
+                      if mod.name not in EXCLUDE]
+
+def parse_importtime(stderr:str) -> dict[str, tuple[int, int]]:
+  '''Parse `-X importtime` output
+
+  :returns: dict mapping module names to `(self_us, cumulative_us)`
+  '''
+  times = {}
+  for line in stderr.splitlines():
+    if not line.startswith('import time:'): continue
+    fields = line[len('import time:'):].split('|')
+    if len(fields) != 3 or not fields[0].strip().isdigit(): continue   # Header line
+    times[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+  return times
+
+def import_time(module:str, path:str, env:dict[str, str]) -> dict:
+  '''Import a module in a fresh interpreter
+
+  :returns: dict with the module timings or the import error
+  '''
+  result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd = path, env = env, capture_output = True, text = True, check = False)
+  if result.returncode != 0:
+    return dict(error = result.stderr.strip().splitlines()[-1])
+  times = parse_importtime(result.stderr)
+  self_us, cumulative_us = times[module]
+  deps = sorted(((name, t[0]) for name, t in times.items() if name != module),
+                key = lambda x: x[1], reverse = True)
+  return dict(self_us = self_us, cumulative_us = cumulative_us, slowest = deps[:5])
+
+def best_of(module:str, path:str, env:dict[str, str], repeat:int) -> dict:
+  '''Keep the fastest of several runs'''
+  best = None
+  for _ in range(repeat):
+    res = import_time(module, path, env)
+    if 'error' in res: return res
+    if best is None or res['cumulative_us'] < best['cumulative_us']: best = res
+  return best
+
+def measure(modules:list[str], repeat:int) -> dict:
+  '''Measure cold and warm import times for all modules'''
+  env = dict(os.environ)
+  env.pop('PYTHONPATH', None)
+  cold_env = dict(env, PYTHONDONTWRITEBYTECODE = '1')
+  results = {}
+  with tempfile.TemporaryDirectory() as tmpdir:
+    shutil.copytree(os.path.join(TOPDIR, PACKAGE), os.path.join(tmpdir, PACKAGE),
+                    ignore = shutil.ignore_patterns('__pycache__', '_version.py'))
+    for module in modules:
+      import_time(module, TOPDIR, env)   # Make sure the byte code is cached
+      results[module] = dict(cold = best_of(module, tmpdir, cold_env, repeat),
+                             warm = best_of(module, TOPDIR, env, repeat))
+  return results
+
+def check_budget(results:dict, budget:dict) -> list[str]:
+  '''Compare warm import times against the budget
+
+  :returns: list of error messages
+  '''
+  errors = []
+  for module, res in results.items():
+    limit_ms = budget.get('modules', {}).get(module, budget.get('default_ms'))
+    warm = res['warm']
+    if limit_ms is None or 'error' in warm: continue
+    if warm['cumulative_us'] > limit_ms * 1000:
+      errors.append(f'{module}: {warm["cumulative_us"] / 1000:.1f}ms exceeds budget of {limit_ms}ms')
+  return errors
+
+if __name__ == '__main__':
+  cli = argparse.ArgumentParser(description = 'Measure mypielib import times')
+  cli.add_argument('-o', '--output', default = None, help = 'Write JSON results to this file instead of stdout')
+  cli.add_argument('-b', '--budget', default = os.path.join(os.path.dirname(__file__), 'import_budget.json'),
+                   help = 'JSON file with import time budgets')
+  cli.add_argument('-r', '--repeat', type = int, default = 3, help = 'Runs per measurement, the fastest is kept')
+  cli.add_argument('modules', nargs = '*', help = 'Modules to measure, defaults to all')
+  args = cli.parse_args()
+
+  modules = args.modules if len(args.modules) else list_modules(os.path.join(TOPDIR, PACKAGE))
+  results = measure(modules, args.repeat)
+  text = json.dumps(results, indent = 2)
+  if args.output is None:
+    print(text)
+  else:
+    with open(args.output, 'w') as fp:
+      fp.write(text + '\n')
+
+  with open(args.budget, 'r') as fp:
+    budget = json.load(fp)
+  errors = check_budget(results, budget)
+  for msg in errors:
+    sys.stderr.write(msg + '\n')
+  sys.exit(1 if len(errors) else 0)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+'''
+Measure `arrayu.merge_recursive` scaling
+
+Merges a number of configuration like layers, both wide (many keys
+per level) and deep (few keys, many levels), at increasing sizes.
+The time per input node should stay about constant as the size
+grows.  The previous, recursive, implementation is timed for
+comparison on copies of the inputs, as it modifies them.
+
+Usage:
+
+```bash
+python3 benchmarks/merge_recursive.py [layers]
+```
+'''
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from mypielib.arrayu import merge_recursive  # noqa: E402
+
+def merge_recursive_ref(*arrays:list[dict]) -> dict:
+  '''Reference: the previous recursive implementation'''
+  array1 = dict()
+  for array in arrays:
+    for key, value in array.items():
+      if key in array1:
+        if isinstance(value, dict):
+          array[key] = merge_recursive_ref(array1[key], value)
+        if isinstance(value, (list, tuple)):
+          array[key] += array1[key]
+    array1.update(array)
+  return array1
+
+def make_wide(layer:int, size:int) -> dict:
+  '''Two levels with `size` keys in total, half of them shared by all layers'''
+  width = max(1, int(size ** 0.5))
+  return {f'section{i}': {f'key{j}' if j % 2 else f'key{j}-{layer}': [layer, j] for j in range(width)}
+          for i in range(width)}
+
+def make_deep(layer:int, size:int) -> dict:
+  '''A chain of `size` levels, each with a shared and a per layer key'''
+  root = node = {}
+  for i in range(size):
+    node[f'only{layer}'] = i
+    node['next'] = node = {}
+  return root
+
+def count(data) -> int:
+  '''Count the nodes of a structure'''
+  total = 0
+  stack = [data]
+  while len(stack):
+    item = stack.pop()
+    total += 1
+    if isinstance(item, dict): stack.extend(item.values())
+    elif isinstance(item, list): stack.extend(item)
+  return total
+
+def bench(label:str, func, layers:list[dict]) -> float:
+  '''Time a merge and report time per input node'''
+  nodes = sum(count(layer) for layer in layers)
+  t0 = time.perf_counter()
+  func(*layers)
+  elapsed = time.perf_counter() - t0
+  print(f'{label:10} {nodes:9} nodes {elapsed:8.3f}s {elapsed / nodes * 1e9:8.1f} ns/node')
+  return elapsed
+
+if __name__ == '__main__':
+  nlayers = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+  sys.setrecursionlimit(10000)
+  for shape, make in (('wide', make_wide), ('deep', make_deep)):
+    for size in (1000, 4000, 16000, 64000) if shape == 'wide' else (250, 500, 1000, 2000):
+      layers = [make(i, size) for i in range(nlayers)]
+      print(f'{shape} layers={nlayers} size={size}')
+      if merge_recursive(*layers) != merge_recursive_ref(*copy.deepcopy(layers)):
+        sys.exit('Merge results differ!')
+      bench('iterative', merge_recursive, layers)
+      layers = copy.deepcopy(layers)
+      bench('recursive', merge_recursive_ref, layers)
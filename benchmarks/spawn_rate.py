@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+'''
+Measure process spawn rate
+
+Compares `subprocess.run` against `mypielib.spawn.run`, optionally
+with a large amount of memory allocated in the parent to show the
+page table copying cost of `fork`.
+
+Usage:
+
+```bash
+python3 benchmarks/spawn_rate.py [count] [ballast-MB]
+```
+'''
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from mypielib import spawn  # noqa: E402
+
+def bench(label:str, func, count:int):
+  '''Run `func` count times and report spawns per second'''
+  t0 = time.perf_counter()
+  for _ in range(count):
+    func(['true'])
+  elapsed = time.perf_counter() - t0
+  print(f'{label:16} {count:6} spawns {elapsed:8.3f}s {count / elapsed:9.1f} spawns/s')
+
+if __name__ == '__main__':
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+  ballast_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+  ballast = bytearray(ballast_mb << 20)
+  for i in range(0, len(ballast), 4096):
+    ballast[i] = 1   # Touch pages so they are mapped
+  print(f'posix_spawn available: {spawn.HAVE_POSIX_SPAWN}, ballast: {ballast_mb} MB')
+  bench('subprocess.run', lambda cmd: subprocess.run(cmd, check=False), count)
+  bench('spawn.run', spawn.run, count)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+'''
+Compare per leaf and vectorized `arrayu.transform` on numeric data
+
+Builds a JSON like payload with metric arrays of the given length
+and scales every value, once calling the callback per leaf and
+once with `vectorize=True`, which passes whole arrays to NumPy.
+
+Usage:
+
+```bash
+python3 benchmarks/transform_numeric.py [array-length [arrays]]
+```
+'''
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from mypielib import arrayu  # noqa: E402
+
+def make_payload(length:int, count:int) -> dict:
+  '''Create `count` metric series of `length` values'''
+  return {'host': 'example', 'series': [
+    {'name': f'metric{i}', 'unit': 'ms', 'values': [float(j % 1000) + i for j in range(length)]}
+    for i in range(count)
+  ]}
+
+def scale(x):
+  '''Callback accepting both scalars and arrays'''
+  return x * 1.5 + 1 if not isinstance(x, str) else x
+
+def bench(label:str, payload:dict, **kwargs) -> tuple[float, dict]:
+  '''Time a transform run'''
+  data = copy.deepcopy(payload)
+  t0 = time.perf_counter()
+  arrayu.transform(data, scale, **kwargs)
+  elapsed = time.perf_counter() - t0
+  print(f'{label:10} {elapsed:8.3f}s')
+  return elapsed, data
+
+if __name__ == '__main__':
+  if arrayu._numpy() is None: sys.exit('NumPy is not installed')
+  length = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+  count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+  payload = make_payload(length, count)
+  print(f'arrays={count} length={length}')
+  slow, expected = bench('per-leaf', payload)
+  fast, result = bench('vectorized', payload, vectorize = True)
+  print(f'speedup    {slow / fast:8.1f}x')
+  if result != expected: sys.exit('Results differ!')
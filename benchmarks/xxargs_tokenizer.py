@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+'''
+Measure `xxargs` input tokenizer throughput
+
+Compares the block based `read_items` against a character at a
+time reference tokenizer (the algorithm `xxargs` used before) and
+checks that both produce the same items.
+
+Usage:
+
+```bash
+python3 benchmarks/xxargs_tokenizer.py [megabytes]
+```
+'''
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from mypielib.__main__ import read_items  # noqa: E402
+
+def read_items_char(fh, delimiter:str|None):
+  '''Reference tokenizer: one `read(1)` per character'''
+  item = None
+  while (ch := fh.read(1)) != '':
+    if (ch.isspace() if delimiter is None else ch == delimiter):
+      if item is not None or delimiter is not None: yield item or ''
+      item = None
+    else:
+      item = ch if item is None else item + ch
+  if item is not None: yield item
+
+def make_input(size:int, delimiter:str) -> str:
+  '''Generate `find -print0` like input of about `size` bytes'''
+  names = []
+  total = 0
+  i = 0
+  while total < size:
+    name = f'./some/directory/level{i % 97}/file-{i}.txt'
+    names.append(name)
+    total += len(name) + 1
+    i += 1
+  return delimiter.join(names) + delimiter
+
+def bench(label:str, func, text:str) -> list[str]:
+  '''Time a tokenizer run and report throughput'''
+  t0 = time.perf_counter()
+  items = list(func(text))
+  elapsed = time.perf_counter() - t0
+  mb = len(text) / (1 << 20)
+  print(f'{label:8} {len(items):9} items {elapsed:8.3f}s {mb / elapsed:9.1f} MB/s')
+  return items
+
+if __name__ == '__main__':
+  size = int(float(sys.argv[1]) * (1 << 20)) if len(sys.argv) > 1 else 8 << 20
+  for delimiter in ('\0', '\n', None):
+    text = make_input(size, ' ' if delimiter is None else delimiter)
+    print(f'delimiter={delimiter!r} size={len(text)}')
+    fast = bench('block', lambda t: read_items(io.BytesIO(t.encode()), delimiter), text)
+    slow = bench('read(1)', lambda t: read_items_char(io.StringIO(t), delimiter), text)
+    if fast != slow:
+      sys.exit('Tokenizer results differ!')
@@ -1,11 +1,40 @@
 '''
 My private python library
+
+The package root does not import any of its modules.  `VERSION`,
+`SETUP_VERSION` and the library modules are loaded on first
+attribute access, so importing a single module (for example
+`mypielib.boolval`) does not run `git describe`.
+
+```{doctest}
+
+>>> import os, subprocess, sys
+>>> import mypielib
+>>> topdir = os.path.dirname(os.path.dirname(mypielib.__file__))
+>>> subprocess.run([sys.executable, '-c',
+...                 'import sys, mypielib.boolval; print("mypielib.version" in sys.modules)'],
+...                cwd = topdir, capture_output = True, text = True).stdout
+'False\\n'
+>>> isinstance(mypielib.VERSION, str)
+True
+>>> mypielib.boolval.__name__
+'mypielib.boolval'
+
+```
 '''
+_VERSION_ATTRS = ('VERSION', 'SETUP_VERSION')
 
-from .version import VERSION
-# only purpose of `_keep` is to fake the usage of a few symbols
-# such that the star imports are not flagged as dead code.
-# It does nothing at runtime.
-def _keep(x): pass
+def __getattr__(name:str):
+  '''Lazily load version information and library modules'''
+  import importlib
+  if name in _VERSION_ATTRS:
+    return getattr(importlib.import_module('.version', __name__), name)
+  if not name.startswith('_'):
+    try:
+      return importlib.import_module(f'.{name}', __name__)
+    except ModuleNotFoundError as exc:
+      if exc.name != f'{__name__}.{name}': raise
+  raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-_keep(VERSION)
+def __dir__() -> list[str]:
+  return sorted(list(globals()) + list(_VERSION_ATTRS))
@@ -7,14 +7,36 @@ except ImportError:  # Graceful fallback if IceCream isn't installed.
   ic = lambda *a: None if not a else (a[0] if len(a) == 1 else a)  # noqa
 
 import argparse
+import collections
+import concurrent.futures
+import importlib
+import json
 import os
+import select
+import shutil
+import struct
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+import traceback
 
-from mypielib.version import VERSION
+from mypielib import spawn
+
+CALL_POOL_THREAD = 'thread'
+'''Run `--call` targets in a thread pool'''
+CALL_POOL_PROCESS = 'process'
+'''Run `--call` targets in a process pool'''
+DISPATCH_ROUND_ROBIN = 'round-robin'
+'''Send items to coprocess workers in turn'''
+DISPATCH_LEAST_LOADED = 'least-loaded'
+'''Send items to the coprocess worker with the least data queued, not yet written to its pipe'''
 
 def make_parser():
   ''' Command Line Interface argument parser '''
+  from mypielib.version import VERSION
+
   name = sys.argv[0]
   if os.path.basename(name) == '__main__.py': name = os.path.basename(os.path.dirname(name))
   if 'sphinx' in sys.argv[0]: os.environ['NO_COLOR'] = '1'
@@ -35,31 +57,860 @@ def make_parser():
                     help='Read items from file instead of standard input.')
   sub0.add_argument('-n','--max-args', type=int, default=None,
                     help='Use at most max-args arguments per command line.')
+  sub0.add_argument('-S','--max-chars', type=int, default=None,
+                    help='Use at most max-chars bytes per command line.  Defaults to the system ARG_MAX limit.')
+  sub0.add_argument('-I','--replace', metavar='REPL', default=None,
+                    help='Replace REPL in the command arguments with the input items.  Implies --max-args 1 unless given.')
   sub0.add_argument('-o','--open-tty', action='store_true', default=False,
                     help='Reopen stdin as /dev/tty in the child process before executing the command.')
   sub0.add_argument('-t','--verbose', action='store_true', default=False,
                     help='Print the command line on the standard error output before executing it.')
+  sub0.add_argument('-P','--max-procs', type=int, default=1,
+                    help='Run up to max-procs processes at a time.  Use 0 to run one process per CPU.')
+  sub0.add_argument('-k','--keep-going', action='store_true', default=False,
+                    help='Keep running commands after a command fails.  By default no new commands are started after the first failure.')
+  sub0.add_argument('-K','--keep-order', action='store_true', default=False,
+                    help='Buffer the output of each command and write it in input order.')
+  sub0.add_argument('--joblog', metavar='FILE', default=None,
+                    help='Record start time, run time, exit code and items of each command in FILE.')
+  sub0.add_argument('--resume', action='store_true', default=False,
+                    help='Skip items already processed by successful commands recorded in the --joblog.')
+  sub0.add_argument('-C','--coproc', action='store_true', default=False,
+                    help='Start max-procs long running commands once and stream the items to their standard input.')
+  sub0.add_argument('--dispatch', choices=[DISPATCH_ROUND_ROBIN, DISPATCH_LEAST_LOADED], default=DISPATCH_LEAST_LOADED,
+                    help='How items are distributed to --coproc workers.')
+  sub0.add_argument('--call', metavar='MODULE:FUNC', default=None,
+                    help='Call a Python function with each batch of arguments instead of running a command.')
+  sub0.add_argument('--call-pool', choices=[CALL_POOL_THREAD, CALL_POOL_PROCESS], default=CALL_POOL_THREAD,
+                    help='Pool used to run --call targets concurrently.')
   sub0.add_argument('cmd',nargs='*', default=[],
                     help='Command to execute')
 
   return cli
 
 
-def exec_cmd(cmd:list[str], input_fh = None, verbose:bool  = False):
-  '''Execute the command
+def exec_cmd(cmd:list[str], input_fh = None, verbose:bool  = False,
+             output_fh = None) -> spawn.SpawnedProcess|subprocess.Popen:
+  '''Start the command
 
   :param cmd: command to execute
   :param input_fh: File handle to use for stdin
   :param verbose: print command before running
+  :param output_fh: File handle to use for stdout.  If None, it is inherited.
+  :returns: process handle for the running command
+
+  The command is started with `mypielib.spawn.popen` and not
+  waited for.  Use a `JobPool` to reap it.
   '''
   if verbose:
     sys.stderr.write(' '.join(cmd))
     sys.stderr.write('\n')
 
-  result = subprocess.run(cmd, stdin = input_fh)
-  ic(result)
-  if result.returncode: sys.exit(result.returncode)
+  proc = spawn.popen(cmd, input_fh, output_fh)
+  ic(proc)
+  return proc
+
+SPOOL_SIZE = 1 << 20
+'''Output of a running job kept in memory before spilling to a temp file'''
+SPOOL_MEMORY = 16 << 20
+'''Memory used by finished jobs waiting for earlier jobs to complete'''
+COPY_SIZE = 1 << 16
+'''Block size used when copying job output'''
+
+class OrderedOutput:
+  '''Collect the output of concurrent jobs and write it in job order
+
+  :param out: binary file handle to write to.  Defaults to standard output.
+  :param spool_size: bytes of a job's output kept in memory before using a temp file
+  :param memory: bytes kept in memory by finished jobs waiting for their turn
+
+  Each job writes to a pipe which is copied into a
+  `tempfile.SpooledTemporaryFile` by a reader thread.  When a job
+  finishes, the output of all the jobs completed so far in input
+  order is written out.  Waiting jobs that would exceed `memory`
+  are moved to disk.
+
+  ```{doctest}
+
+  >>> import io
+  >>> import os
+  >>> from mypielib.__main__ import OrderedOutput
+  >>> out = io.BytesIO()
+  >>> oo = OrderedOutput(out)
+  >>> first, fd1 = oo.open()
+  >>> second, fd2 = oo.open()
+  >>> _ = os.write(fd2, b'second\\n'); os.close(fd2)
+  >>> oo.close(second)
+  >>> out.getvalue()
+  b''
+  >>> _ = os.write(fd1, b'first\\n'); os.close(fd1)
+  >>> oo.close(first)
+  >>> out.getvalue()
+  b'first\\nsecond\\n'
+
+  ```
+  '''
+  def __init__(self, out = None, spool_size:int = SPOOL_SIZE, memory:int = SPOOL_MEMORY):
+    self.out = sys.stdout.buffer if out is None else out
+    self.spool_size = spool_size
+    self.memory = memory
+    self.jobs = {}
+    self.done = {}
+    self.opened = 0
+    self.emitted = 0
+    self.waiting = 0
+
+  def open(self) -> tuple[int, int]:
+    '''Create the output buffer for a new job
+
+    :returns: tuple with the job index and the file descriptor the job should write to
+
+    The caller must close the file descriptor once the job is started.
+    '''
+    rfd, wfd = os.pipe()
+    spool = tempfile.SpooledTemporaryFile(max_size = self.spool_size)
+    reader = threading.Thread(target = self._copy, args = (rfd, spool), daemon = True)
+    reader.start()
+    index = self.opened
+    self.jobs[index] = (reader, spool)
+    self.opened += 1
+    return index, wfd
+
+  @staticmethod
+  def _copy(rfd:int, spool):
+    '''Reader thread copying a job pipe into its spool file'''
+    with open(rfd, 'rb', buffering = 0) as fh:
+      while (data := fh.read(COPY_SIZE)):
+        spool.write(data)
+
+  def close(self, index:int):
+    '''Mark a job as finished and write out any output now in order
+
+    :param index: job index as returned by `open`
+    '''
+    reader, spool = self.jobs.pop(index)
+    reader.join()
+    size = 0
+    if index != self.emitted:
+      size = spool.tell()
+      if self.waiting + size > self.memory:
+        spool.rollover()
+        size = 0
+      self.waiting += size
+    self.done[index] = (spool, size)
+    while self.emitted in self.done:
+      spool, size = self.done.pop(self.emitted)
+      self.waiting -= size
+      spool.seek(0)
+      shutil.copyfileobj(spool, self.out, COPY_SIZE)
+      spool.close()
+      self.emitted += 1
+    self.out.flush()
+
+class JobLog:
+  '''Journal of the jobs run by a pool
+
+  :param filename: journal file
+  :param resume: If True, the existing journal is loaded and appended to.  Otherwise it is overwritten.
+
+  The journal has one JSON object per line with the keys:
+
+  - `seq`: job sequence number
+  - `start`: start time (seconds since the epoch)
+  - `wall`: elapsed time in seconds
+  - `user`, `sys`: CPU time in seconds, `null` if not available
+  - `exitcode`: job return code
+  - `items`: input items processed by the job
+
+  Lines are flushed as each job finishes, so the journal survives
+  if `xxargs` is killed.
+
+  ```{doctest}
+
+  >>> import os, tempfile
+  >>> from mypielib.__main__ import JobLog
+  >>> tmpdir = tempfile.TemporaryDirectory()
+  >>> fn = os.path.join(tmpdir.name, 'joblog')
+  >>> log = JobLog(fn)
+  >>> log.begin('job1', ['a', 'b'])
+  >>> log.end('job1', 0)
+  >>> log.begin('job2', ['c'])
+  >>> log.end('job2', 1)
+  >>> log.close()
+  >>> log = JobLog(fn, resume = True)
+  >>> list(log.skip(['a', 'b', 'c', 'd']))
+  ['c', 'd']
+  >>> log.close()
+
+  ```
+  '''
+  def __init__(self, filename:str, resume:bool = False):
+    self.completed = collections.Counter()
+    self.seq = 0
+    if resume and os.path.exists(filename): self._load(filename)
+    self.fh = open(filename, 'a' if resume else 'w')
+    self.active = {}
+
+  def _load(self, filename:str):
+    '''Read the items of jobs that succeeded from an existing journal'''
+    with open(filename, 'r') as fh:
+      for line in fh:
+        try:
+          entry = json.loads(line)
+        except ValueError:
+          continue   # Partially written line
+        self.seq = max(self.seq, entry.get('seq', 0))
+        if entry.get('exitcode') == 0: self.completed.update(entry.get('items', []))
+
+  def skip(self, items):
+    '''Filter out items already processed by successful jobs
+
+    :param items: iterable with input items
+    :yields: items not yet processed
+
+    Repeated items are skipped as many times as they were processed.
+    '''
+    for item in items:
+      if self.completed[item] > 0:
+        self.completed[item] -= 1
+        continue
+      yield item
+
+  def begin(self, job, items:list[str]):
+    '''Record the start of a job
+
+    :param job: hashable job identifier
+    :param items: input items for the job
+    '''
+    self.seq += 1
+    self.active[job] = (self.seq, items, time.time(), time.monotonic())
+
+  def end(self, job, returncode:int, rusage = None):
+    '''Record the end of a job
+
+    :param job: hashable job identifier
+    :param returncode: job return code
+    :param rusage: resource usage of the job as returned by `os.wait4`
+    '''
+    seq, items, start, t0 = self.active.pop(job)
+    entry = dict(seq = seq,
+                 start = round(start, 3),
+                 wall = round(time.monotonic() - t0, 6),
+                 user = None if rusage is None else round(rusage.ru_utime, 6),
+                 sys = None if rusage is None else round(rusage.ru_stime, 6),
+                 exitcode = returncode,
+                 items = items)
+    self.fh.write(json.dumps(entry) + '\n')
+    self.fh.flush()
+
+  def close(self):
+    '''Close the journal file'''
+    self.fh.close()
+
+class JobPool:
+  '''Run commands with a bounded number of concurrent processes
+
+  :param max_procs: maximum number of running processes.  If `0`, one per CPU.
+  :param keep_going: If False, stop starting commands after the first failure.
+  :param output: If given, an `OrderedOutput` used to collect the commands' output in order
+  :param joblog: If given, a `JobLog` where finished commands are recorded
+
+  Children are reaped as they finish.  The pool exit status is
+  the return code of the first command that failed, or `0` if all
+  of them succeeded.
+  '''
+  def __init__(self, max_procs:int = 1, keep_going:bool = False,
+               output:OrderedOutput|None = None, joblog:JobLog|None = None):
+    self.max_procs = max_procs if max_procs > 0 else (os.cpu_count() or 1)
+    self.keep_going = keep_going
+    self.output = output
+    self.joblog = joblog
+    self.slots = {}
+    self.running = {}
+    self.started = 0
+    self.failed = 0
+    self.returncode = 0
+
+  @property
+  def stopped(self) -> bool:
+    '''True if no more commands should be started'''
+    return self.returncode != 0 and not self.keep_going
+
+  def submit(self, cmd:list[str], input_fh = None, verbose:bool = False, items:list[str]|None = None):
+    '''Start a command, waiting for a free slot first
+
+    :param cmd: command to execute
+    :param input_fh: File handle to use for stdin
+    :param verbose: print command before running
+    :param items: input items used by the command, for the job log.  Defaults to `cmd`.
+    :returns: process handle for the started command
+
+    If the pool was stopped by a failed command, it waits for the
+    remaining children and exits with the failing return code.
+    '''
+    while len(self.running) >= self.max_procs:
+      self.reap()
+    if self.stopped: sys.exit(self.wait())
+    job = self.start(cmd, input_fh, verbose)
+    self.started += 1
+    if self.joblog is not None: self.joblog.begin(job, cmd if items is None else items)
+    return job
+
+  def start(self, cmd:list[str], input_fh = None, verbose:bool = False) -> spawn.SpawnedProcess|subprocess.Popen:
+    '''Start a command and add it to the running jobs'''
+    if self.output is None:
+      proc = exec_cmd(cmd, input_fh, verbose)
+    else:
+      slot, output_fd = self.output.open()
+      try:
+        proc = exec_cmd(cmd, input_fh, verbose, output_fd)
+      finally:
+        os.close(output_fd)
+      self.slots[proc.pid] = slot
+    self.running[proc.pid] = proc
+    return proc
+
+  def reap(self):
+    '''Wait for any running command to finish'''
+    pid, status, rusage = os.wait4(-1, 0)
+    proc = self.running.pop(pid, None)
+    if proc is None: return
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    ic(proc)
+    if pid in self.slots: self.output.close(self.slots.pop(pid))
+    self.done(proc, proc.returncode, rusage)
+
+  def done(self, job, returncode:int, rusage = None):
+    '''Account for a finished job
+
+    :param job: the finished job
+    :param returncode: return code of the job
+    :param rusage: resource usage of the job, if available
+    '''
+    if self.joblog is not None: self.joblog.end(job, returncode, rusage)
+    if returncode:
+      self.failed += 1
+      if not self.returncode: self.returncode = returncode
+
+  def wait(self) -> int:
+    '''Wait for all running commands
+
+    :returns: aggregated exit status
+    '''
+    while len(self.running):
+      self.reap()
+    if self.failed and self.keep_going:
+      sys.stderr.write(f'{self.failed} of {self.started} commands failed\n')
+    return self.returncode
+
+
+def load_callable(target:str):
+  '''Import a `module:function` target
+
+  :param target: module name and attribute path separated by a colon
+  :returns: callable object
+
+  ```{doctest}
+
+  >>> from mypielib.__main__ import load_callable
+  >>> load_callable('os.path:join')('a', 'b')
+  'a/b'
+  >>> load_callable('os.path')
+  Traceback (most recent call last):
+  ValueError: os.path: expected module:function
+
+  ```
+  '''
+  module, sep, attrs = target.partition(':')
+  if not sep or not module or not attrs: raise ValueError(f'{target}: expected module:function')
+  obj = importlib.import_module(module)
+  for attr in attrs.split('.'):
+    obj = getattr(obj, attr)
+  return obj
+
+def call_target(func, argv:list[str]) -> int:
+  '''Call a Python target with a batch of arguments
+
+  :param func: function to call, it receives `argv` as its only argument
+  :param argv: argument list
+  :returns: exit code for the call
+
+  The return value is mapped like a process exit code: `None` and
+  `0` mean success, any other integer is returned as is.  `SystemExit`
+  uses its exit code and other exceptions are printed and return `1`.
+
+  ```{doctest}
+
+  >>> from mypielib.__main__ import call_target
+  >>> call_target(len, ['a', 'b'])
+  2
+  >>> call_target(print, ['a', 'b'])
+  ['a', 'b']
+  0
+  >>> import sys
+  >>> call_target(lambda argv: sys.exit(3), [])
+  3
+
+  ```
+  '''
+  try:
+    result = func(argv)
+  except SystemExit as exc:
+    result = exc.code
+  except Exception:  # noqa: BLE001
+    traceback.print_exc()
+    return 1
+  if result is None: return 0
+  return result if isinstance(result, int) else 1
+
+class CallPool(JobPool):
+  '''Run a Python callable on batches of arguments
+
+  :param target: `module:function` to call.  It is imported once.
+  :param max_procs: maximum number of concurrent calls.  If `0`, one per CPU.
+  :param keep_going: If False, stop starting calls after the first failure.
+  :param pool: `CALL_POOL_THREAD` or `CALL_POOL_PROCESS`
+  :param joblog: If given, a `JobLog` where finished calls are recorded
+
+  Same exit status rules as `JobPool`, with return codes as
+  given by `call_target`.  For process pools, the function must be
+  importable by the worker processes.  CPU times are not available
+  for the job log.
+  '''
+  def __init__(self, target:str, max_procs:int = 1, keep_going:bool = False,
+               pool:str = CALL_POOL_THREAD, joblog:JobLog|None = None):
+    super().__init__(max_procs, keep_going, joblog = joblog)
+    self.target = target
+    self.func = load_callable(target)
+    executor = concurrent.futures.ProcessPoolExecutor if pool == CALL_POOL_PROCESS else concurrent.futures.ThreadPoolExecutor
+    self.executor = executor(self.max_procs)
+
+  def start(self, cmd:list[str], input_fh = None, verbose:bool = False) -> concurrent.futures.Future:
+    '''Submit a call to the executor'''
+    if verbose:
+      sys.stderr.write(' '.join([self.target] + cmd))
+      sys.stderr.write('\n')
+    future = self.executor.submit(call_target, self.func, cmd)
+    self.running[future] = future
+    return future
+
+  def reap(self):
+    '''Wait for any running call to finish'''
+    done, _ = concurrent.futures.wait(self.running, return_when = concurrent.futures.FIRST_COMPLETED)
+    for future in done:
+      del self.running[future]
+      self.done(future, future.result())
+
+  def wait(self) -> int:
+    '''Wait for all running calls and shut down the executor
+
+    :returns: aggregated exit status
+    '''
+    returncode = super().wait()
+    self.executor.shutdown()
+    return returncode
+
+
+READ_SIZE = 1 << 20
+'''Block size used when reading input items'''
+
+def read_items(fh, delimiter:str|None = '\n', bufsize:int = READ_SIZE):
+  '''Split an input stream into items
+
+  :param fh: File handle to read from.  Text streams are read through their binary buffer.
+  :param delimiter: Item terminator.  If None, items are separated by whitespace.
+  :param bufsize: Size of the blocks read from `fh`
+  :yields: input items, decoded with `os.fsdecode`
+
+  Input is read in large blocks and split with `bytes.split`.  Partial
+  items at the end of a block are carried over to the next one.
+  Empty items are kept when using a delimiter, but a trailing
+  delimiter does not produce an empty last item.
+
+  Examples:
+
+  ```{doctest}
 
+  >>> import io
+  >>> from mypielib.__main__ import read_items
+  >>> list(read_items(io.BytesIO(b'one\\0two\\0\\0three\\0'), '\\0', 3))
+  ['one', 'two', '', 'three']
+  >>> list(read_items(io.BytesIO(b'  one two\\n three  '), None, 4))
+  ['one', 'two', 'three']
+  >>> list(read_items(io.BytesIO(b''), '\\n'))
+  []
+
+  ```
+  '''
+  fh = getattr(fh, 'buffer', fh)
+  sep = None if delimiter is None else os.fsencode(delimiter)
+  tail = b''
+  while (chunk := fh.read(bufsize)):
+    items = (tail + chunk).split(sep)
+    if sep is not None or not chunk[-1:].isspace():
+      tail = items.pop() if len(items) else b''
+    else:
+      tail = b''
+    for item in items:
+      yield os.fsdecode(item)
+  if tail: yield os.fsdecode(tail)
+
+ARG_MAX_DEFAULT = 32767
+'''Command line limit used when `SC_ARG_MAX` is not available (Windows)'''
+ARG_HEADROOM = 2048
+'''Bytes of the argument area left unused, as a safety margin'''
+PTR_SIZE = struct.calcsize('P')
+'''Size of an `argv`/`envp` pointer'''
+
+def arg_size(arg:str) -> int:
+  '''Bytes used by an argument in the exec argument area
+
+  :param arg: argument string
+  :returns: encoded length plus terminating NUL and `argv` pointer
+
+  ```{doctest}
+
+  >>> from mypielib.__main__ import arg_size, PTR_SIZE
+  >>> arg_size('hello') == 6 + PTR_SIZE
+  True
+
+  ```
+  '''
+  return len(os.fsencode(arg)) + 1 + PTR_SIZE
+
+def arg_budget(prefix:list[str], env:dict[str,str]|None = None, max_chars:int|None = None) -> int:
+  '''Compute the space available for items in a command line
+
+  :param prefix: command and its fixed arguments
+  :param env: environment passed to the command.  Defaults to `os.environ`
+  :param max_chars: user limit for the whole command line
+  :returns: bytes available for items, as measured by `arg_size`
+
+  The system limit is `SC_ARG_MAX` minus the size of the environment,
+  the prefix and `ARG_HEADROOM`.
+
+  ```{doctest}
+
+  >>> from mypielib.__main__ import arg_budget, arg_size
+  >>> arg_budget(['echo'], {}, 100) == 100 - arg_size('echo')
+  True
+  >>> arg_budget(['echo']) > 0
+  True
+
+  ```
+  '''
+  if env is None: env = os.environ
+  try:
+    arg_max = os.sysconf('SC_ARG_MAX')
+  except (AttributeError, ValueError, OSError):
+    arg_max = -1
+  if arg_max <= 0: arg_max = ARG_MAX_DEFAULT
+
+  used = sum(arg_size(arg) for arg in prefix)
+  budget = arg_max - ARG_HEADROOM - used - sum(arg_size(f'{k}={v}') for k, v in env.items())
+  if max_chars is not None: budget = min(budget, max_chars - used)
+  return budget
+
+def make_batches(items, max_args:int|None = None, max_size:int|None = None, size = arg_size):
+  '''Group items into command line batches
+
+  :param items: iterable with input items
+  :param max_args: max number of items per batch.
+  :param max_size: max total size of the items in a batch
+  :param size: function returning the size of an item
+  :yields: lists of items
+
+  Batches are filled as close to the limits as possible.  If neither
+  limit is given, all items go in a single batch.  An item larger
+  than `max_size` is put in a batch by itself.
+
+  Examples:
+
+  ```{doctest}
+
+  >>> from mypielib.__main__ import make_batches
+  >>> list(make_batches('abcde', 2))
+  [['a', 'b'], ['c', 'd'], ['e']]
+  >>> list(make_batches('abc'))
+  [['a', 'b', 'c']]
+  >>> list(make_batches(''))
+  []
+  >>> list(make_batches(['one', 'two', 'three', 'four'], max_size=8, size=len))
+  [['one', 'two'], ['three'], ['four']]
+
+  ```
+  '''
+  batch = []
+  batch_size = 0
+  for item in items:
+    item_size = 0 if max_size is None else size(item)
+    if len(batch) and max_size is not None and batch_size + item_size > max_size:
+      yield batch
+      batch = []
+      batch_size = 0
+    batch.append(item)
+    batch_size += item_size
+    if max_args is not None and len(batch) >= max_args:
+      yield batch
+      batch = []
+      batch_size = 0
+  if len(batch): yield batch
+
+class CommandTemplate:
+  '''Command line template with replacement slots
+
+  :param cmd: command and its arguments
+  :param repl: replacement string.  If None, items are appended to the command.
+
+  The template is split once into literal arguments and arguments
+  containing `repl`.  The latter are kept as lists of the literal
+  parts between slots, so that an item is substituted with a single
+  `str.join`.  Slot arguments are repeated for each item in a batch.
+
+  Examples:
+
+  ```{doctest}
+
+  >>> from mypielib.__main__ import CommandTemplate
+  >>> tpl = CommandTemplate(['cp', '{}', '/dest/{}.bak'], '{}')
+  >>> tpl.render(['a.txt'])
+  ['cp', 'a.txt', '/dest/a.txt.bak']
+  >>> tpl = CommandTemplate(['cp', '-t', '/dest', '{}'], '{}')
+  >>> tpl.render(['a', 'b'])
+  ['cp', '-t', '/dest', 'a', 'b']
+  >>> tpl.fixed
+  ['cp', '-t', '/dest']
+  >>> CommandTemplate(['echo', '{}'], None).render(['a', 'b'])
+  ['echo', '{}', 'a', 'b']
+
+  ```
+  '''
+  def __init__(self, cmd:list[str], repl:str|None = None):
+    self.args = []
+    self.fixed = []
+    self.slots = []
+    self.append = repl is None
+    for arg in cmd:
+      if repl is not None and repl in arg:
+        parts = arg.split(repl)
+        self.args.append(parts)
+        self.slots.append(parts)
+      else:
+        self.args.append(arg)
+        self.fixed.append(arg)
+    if self.append: self.slots.append(['', ''])
+
+  def render(self, items:list[str]) -> list[str]:
+    '''Build the command line for a batch of items
+
+    :param items: input items
+    :returns: command line
+    '''
+    if self.append: return self.fixed + items
+    cmd = []
+    for arg in self.args:
+      if isinstance(arg, str):
+        cmd.append(arg)
+      else:
+        cmd.extend([item.join(arg) for item in items])
+    return cmd
+
+  def size(self, item:str) -> int:
+    '''Space used by an item in the command line, as measured by `arg_size`'''
+    return sum(arg_size(item.join(parts)) for parts in self.slots)
+
+COPROC_WINDOW = 1 << 16
+'''Max bytes queued for a coprocess worker before waiting for it to read'''
+COPROC_IOV = 1024
+'''Max queued items written to a coprocess worker with a single `writev`'''
+
+class CoprocFeeder:
+  '''Stream items to the standard input of long running workers
+
+  :param procs: worker processes, started with `stdin=subprocess.PIPE`
+  :param dispatch: `DISPATCH_ROUND_ROBIN` or `DISPATCH_LEAST_LOADED`
+
+  Items for each worker are queued and written with non-blocking
+  writes as its pipe becomes writable.  In least-loaded mode, every
+  item goes to the worker with the least data still queued in this
+  process (not yet written to its pipe), so workers that read
+  faster get more items.
+
+  If a worker exits early, the items queued for it, including one
+  it only got partially, are sent to the remaining workers.  Items
+  already written to its pipe can't be recovered, so workers that
+  exit early are counted in `lost`.  Items that can't be delivered
+  because all workers are gone are counted in `undelivered`.
+  '''
+  def __init__(self, procs:list[subprocess.Popen], dispatch:str = DISPATCH_LEAST_LOADED):
+    self.procs = {proc.stdin.fileno(): proc for proc in procs}
+    self.dispatch = dispatch
+    self.pending = {fd: collections.deque() for fd in self.procs}
+    self.queued = {fd: 0 for fd in self.procs}
+    self.offset = {fd: 0 for fd in self.procs}
+    self.workers = list(self.procs)
+    self.next = 0
+    self.undelivered = 0
+    self.lost = 0
+    for fd in self.workers:
+      os.set_blocking(fd, False)
+
+  def _pick(self) -> int:
+    '''Select the worker for the next item'''
+    if self.dispatch == DISPATCH_ROUND_ROBIN:
+      self.next %= len(self.workers)
+      self.next += 1
+      return self.workers[self.next - 1]
+    return min(self.workers, key = lambda fd: self.queued[fd])
+
+  def _queue(self, data:bytes) -> int|None:
+    '''Queue an item for a worker
+
+    :returns: file descriptor of the worker, None if all workers are gone
+    '''
+    if not len(self.workers):
+      self.undelivered += 1
+      return None
+    fd = self._pick()
+    self.pending[fd].append(data)
+    self.queued[fd] += len(data)
+    return fd
+
+  def send(self, data:bytes) -> bool:
+    '''Queue an item for a worker
+
+    :param data: bytes to send
+    :returns: False if all workers are gone
+    '''
+    fd = self._queue(data)
+    while fd in self.workers and self.queued[fd] > COPROC_WINDOW:
+      self.flush()
+    return len(self.workers) > 0
+
+  def _write(self, fd:int) -> int:
+    '''Write queued items to a worker
+
+    :returns: bytes written
+    '''
+    chunks = [self.pending[fd][i] for i in range(min(COPROC_IOV, len(self.pending[fd])))]
+    chunks[0] = memoryview(chunks[0])[self.offset[fd]:]
+    count = os.writev(fd, chunks)
+    self.queued[fd] -= count
+    count += self.offset[fd]
+    while len(self.pending[fd]) and count >= len(self.pending[fd][0]):
+      count -= len(self.pending[fd].popleft())
+    self.offset[fd] = count
+    return count
+
+  def _lost(self, fd:int):
+    '''Re-dispatch the items queued for a worker that exited'''
+    items = self.pending[fd]
+    self.workers.remove(fd)
+    self.pending[fd] = collections.deque()
+    self.queued[fd] = self.offset[fd] = 0
+    self.lost += 1
+    sys.stderr.write(f'coprocess worker {self.procs[fd].pid} exited early, re-sending {len(items)} items\n')
+    for data in items:
+      self._queue(data)
+
+  def flush(self):
+    '''Wait until a worker can be written to and write its queued data'''
+    fds = [fd for fd in self.workers if self.queued[fd]]
+    if not len(fds): return
+    _, ready, _ = select.select([], fds, [])
+    for fd in ready:
+      try:
+        self._write(fd)
+      except BlockingIOError:
+        continue
+      except BrokenPipeError:
+        self._lost(fd)
+
+  def close(self):
+    '''Write all the queued data and close the worker pipes'''
+    while any(self.queued[fd] for fd in self.workers):
+      self.flush()
+    for proc in self.procs.values():
+      proc.stdin.close()
+
+def coproc(prefix:list[str], items, args:argparse.Namespace) -> int:
+  '''Run items through long running worker commands
+
+  :param prefix: worker command
+  :param items: iterable with input items
+  :param args: `xxargs` options
+  :returns: aggregated exit status of the workers, non-zero if a worker exited early
+
+  Items are written to the workers terminated by the
+  delimiter, or by a new line when splitting on whitespace.
+  '''
+  pool = JobPool(args.max_procs, keep_going = True)
+  procs = [pool.submit(prefix, subprocess.PIPE, args.verbose) for _ in range(pool.max_procs)]
+  feeder = CoprocFeeder(procs, args.dispatch)
+  sep = os.fsencode('\n' if args.delimiter is None else args.delimiter)
+  for item in items:
+    if not feeder.send(os.fsencode(item) + sep):
+      feeder.undelivered += sum(1 for _ in items)
+      break
+  feeder.close()
+  rc = pool.wait()
+  if feeder.undelivered:
+    sys.stderr.write(f'{feeder.undelivered} items not delivered, all coprocess workers exited\n')
+  if feeder.lost:
+    sys.stderr.write(f'{feeder.lost} coprocess workers exited early, items written to them may be lost\n')
+    return rc or 1
+  return rc
+
+def batch_args(args:argparse.Namespace) -> int|None:
+  '''Max number of items per batch
+
+  :param args: `xxargs` options
+  :returns: `args.max_args`, defaulting to one item per command with `args.replace`
+  '''
+  if args.max_args is None and args.replace is not None: return 1
+  return args.max_args
+
+def run_commands(prefix:list[str], items, args:argparse.Namespace, joblog:JobLog|None = None) -> int:
+  '''Run a command for each batch of items
+
+  :param prefix: command and its fixed arguments
+  :param items: iterable with input items
+  :param args: `xxargs` options
+  :param joblog: optional job log
+  :returns: aggregated exit status
+  '''
+  input_fh = open('/dev/tty' if args.open_tty else '/dev/null')
+  pool = JobPool(args.max_procs, args.keep_going, OrderedOutput() if args.keep_order else None, joblog)
+  template = CommandTemplate(prefix, args.replace)
+
+  max_size = arg_budget(template.fixed, max_chars = args.max_chars)
+  for cmd_queue in make_batches(items, batch_args(args), max_size, template.size):
+    pool.submit(template.render(cmd_queue), input_fh, args.verbose, cmd_queue)
+  return pool.wait()
+
+def _reject_options(mode:str, options:tuple[tuple[str, bool], ...]) -> None:
+  '''Exit if any of the `(option, used)` pairs was used with `mode`'''
+  for option, used in options:
+    if used: sys.exit(f'{option} can not be used with {mode}')
+
+def check_coproc_args(args:argparse.Namespace) -> None:
+  '''Exit if options that don't apply to coprocesses are used with `--coproc`
+
+  :param argparse.Namespace args: parsed `xxargs` arguments
+
+  This runs before the job log is opened, so it is not truncated.
+  '''
+  _reject_options('--coproc', (('--open-tty', args.open_tty), ('--replace', args.replace is not None),
+                               ('--joblog', args.joblog is not None), ('--resume', args.resume),
+                               ('--keep-order', args.keep_order)))
+
+def check_call_args(args:argparse.Namespace) -> None:
+  '''Exit if options that don't apply to function calls are used with `--call`
+
+  :param argparse.Namespace args: parsed `xxargs` arguments
+  '''
+  _reject_options('--call', (('--coproc', args.coproc), ('--keep-order', args.keep_order),
+                             ('--open-tty', args.open_tty), ('--max-chars', args.max_chars is not None)))
 
 def xxargs(args:argparse.Namespace):
   '''Run a command-like xargs
@@ -67,41 +918,41 @@ def xxargs(args:argparse.Namespace):
   :param str|None args.delimiter: Character used for delimiter.  If None, it will use whitespace.
   :param file-handle args.arg_file: Input file handle
   :param int|None args.max_args: Max args in command line
+  :param int|None args.max_chars: Max size of the command line.  The system limit always applies.
   :param bool args.open_tty: Re-open stdin as /dev/tty
   :param bool args.verbose: Print command-line on stderr
-  :param list[str] args.cmd: Command to execute
+  :param int args.max_procs: Max number of concurrent processes (0 for one per CPU)
+  :param bool args.keep_going: Keep starting commands after a failure
+  :param bool args.keep_order: Write the output of commands in input order
+  :param bool args.coproc: Stream items to max_procs long running commands
+  :param str args.dispatch: How items are distributed to coproc workers
+  :param str|None args.call: Python `module:function` to call instead of running a command
+  :param str args.call_pool: Pool type for concurrent calls
+  :param str|None args.replace: Replace this string in the command with the items
+  :param str|None args.joblog: Job log file
+  :param bool args.resume: Skip items recorded as done in the job log
+  :param list[str] args.cmd: Command to execute.  With `args.call`, leading arguments.
   '''
+  items = read_items(args.arg_file, args.delimiter)
+  if args.resume and args.joblog is None: sys.exit('--resume requires --joblog')
+  if args.call is not None:
+    check_call_args(args)
+  elif args.coproc:
+    check_coproc_args(args)
+  joblog = None if args.joblog is None else JobLog(args.joblog, args.resume)
+  if joblog is not None: items = joblog.skip(items)
 
-  input_fh = open('/dev/tty' if args.open_tty else '/dev/null')
-  prefix = args.cmd if len(args.cmd) else ['echo']
+  if args.call is not None:
+    pool = CallPool(args.call, args.max_procs, args.keep_going, args.call_pool, joblog)
+    template = CommandTemplate(args.cmd, args.replace)
+    for batch in make_batches(items, batch_args(args)):
+      pool.submit(template.render(batch), None, args.verbose, batch)
+    sys.exit(pool.wait())
 
-  if args.delimiter is None:
-    last_ch = ' '
-    validate_ch = lambda ch: ch.isspace()
-    cmd_queue = [ ]
-  else:
-    last_ch = None
-    validate_ch = lambda ch: ch == args.delimiter
-    cmd_queue = [ '' ]
-
-  while (ch := args.arg_file.read(1)) != '':
-    ic(ch)
-    if validate_ch(ch):
-      if args.max_args is not None and len(cmd_queue) == args.max_args:
-        exec_cmd(prefix + cmd_queue, input_fh, args.verbose)
-        cmd_queue = [ '' ]
-      if args.delimiter is not None:
-        ic(last_ch)
-        cmd_queue.append('')
-      ic(ch, cmd_queue)
-    else:
-      if args.delimiter is None and validate_ch(last_ch): cmd_queue.append('')
-      cmd_queue[-1] += ch
-    last_ch = ch
+  prefix = args.cmd if len(args.cmd) else ['echo']
+  if args.coproc: sys.exit(coproc(prefix, items, args))
 
-  if len(cmd_queue):
-    exec_cmd(prefix + cmd_queue, input_fh, args.verbose)
-  sys.exit(0)
+  sys.exit(run_commands(prefix, items, args, joblog))
 
 if __name__ == '__main__':
   cli = make_parser()
@@ -65,8 +65,13 @@ SystemExit: 0
 '''
 
 import argparse
+import collections
+import functools
+import os
 import sys
+import time
 from typing import Any
+
 try:
   from icecream import ic
 except ImportError:  # Graceful fallback if IceCream isn't installed.
@@ -103,6 +108,8 @@ class CFG:
   '''Attribute for defining a completer function'''
   DONT_COMPLETE = 'do_not_complete'
   '''A kwarg to disable argcomplete'''
+  COMPLETION_ENV = '_ARGCOMPLETE'
+  '''Environment variable set by the shell when requesting completions'''
 
 def hint_factory(msg:str):
   '''Helper function to create a readline tab completion function
@@ -116,28 +123,81 @@ def hint_factory(msg:str):
     return []
   return hint_callable
 
-def _add_arg(sub:argparse.ArgumentParser|argparse._MutuallyExclusiveGroup,
-            opts:list|str, kwargs:dict):
-  '''Helper function used to load argument options
-
-  :param sub: sub parser
-  :param opts: varargs list
-  :param kwargs: keyword args dictionary
+def completer_cache_dir() -> str:
+  '''Default directory for `cached_completer` results
 
-  Handles completer options.
+  :returns: `$XDG_CACHE_HOME/mypielib-completion` or `~/.cache/mypielib-completion`
   '''
-  if not isinstance(opts,list): opts = [opts]
-  if CFG.COMPLETER in kwargs:
-    completer = kwargs[CFG.COMPLETER]
-    del kwargs[CFG.COMPLETER]
-    sub.add_argument(*opts, **kwargs).completer = completer
-  else:
-    sub.add_argument(*opts, **kwargs)
+  base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+  return os.path.join(base, 'mypielib-completion')
+
+def cached_completer(ttl:float = 60, key = None, cache_dir:str|None = None):
+  '''Decorator caching the results of a completer function on disk
+
+  :param ttl: seconds the cached results are valid for
+  :param key: function `(prefix, parsed_args)` returning the cache key.  Defaults to the prefix.
+  :param cache_dir: directory for the cache files.  Defaults to `completer_cache_dir()`
+  :returns: decorator
+
+  Completers run in a new process on every Tab press, so expensive
+  completions (host lists, remote file names) are kept in a file per
+  completer and key.  A cache hit costs a `stat` and a JSON load.
+  Results must be JSON serializable.  Cache errors are ignored.
+
+  ```{doctest}
+
+  >>> import tempfile
+  >>> from mypielib.argparse_cfg import cached_completer
+  >>> tmpdir = tempfile.TemporaryDirectory()
+  >>> calls = []
+  >>> @cached_completer(ttl = 300, cache_dir = tmpdir.name)
+  ... def hosts(prefix, parsed_args, **kwargs):
+  ...   calls.append(prefix)
+  ...   return [h for h in ['alpha', 'beta', 'gamma'] if h.startswith(prefix)]
+  >>> hosts('b', None)
+  ['beta']
+  >>> hosts('b', None)
+  ['beta']
+  >>> calls
+  ['b']
+
+  ```
+  '''
+  def decorator(func):
+    name = f'{func.__module__}.{func.__qualname__}'
+
+    @functools.wraps(func)
+    def wrapper(prefix, parsed_args = None, **kwargs):
+      import hashlib
+      import json
+      cache_key = prefix if key is None else key(prefix, parsed_args)
+      digest = hashlib.sha256(f'{name}\0{cache_key}'.encode()).hexdigest()
+      cache_file = os.path.join(cache_dir or completer_cache_dir(), digest + '.json')
+      try:
+        if time.time() - os.stat(cache_file).st_mtime < ttl:
+          with open(cache_file, 'r') as fp:
+            return json.load(fp)
+      except (OSError, ValueError):
+        pass
+
+      result = func(prefix, parsed_args, **kwargs)
+      if not isinstance(result, dict): result = list(result)
+      try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok = True)
+        with open(cache_file + '.tmp', 'w') as fp:
+          json.dump(result, fp)
+        os.replace(cache_file + '.tmp', cache_file)
+      except (OSError, TypeError, ValueError):
+        pass
+      return result
+    return wrapper
+  return decorator
 
 def _argparser_factory(kwargs:dict[Any]) -> argparse.ArgumentParser:
   '''Create an argument parser
 
   Plays with the passed keywords switching defaults around.
+  Completion is set up by `make_parser` once the parser is built.
   '''
   for kw,val in [
           ('fromfile_prefix_chars', '@'),
@@ -149,68 +209,459 @@ def _argparser_factory(kwargs:dict[Any]) -> argparse.ArgumentParser:
           ]:
       if kw not in kwargs: kwargs[kw] = val
 
-  skip_complete = False
-  if CFG.DONT_COMPLETE in kwargs:
-    skip_complete = kwargs[CFG.DONT_COMPLETE]
-    del kwargs[CFG.DONT_COMPLETE]
-  parser = argparse.ArgumentParser(**kwargs)
-  if not skip_complete: argcomplete.autocomplete(parser)
+  return argparse.ArgumentParser(**kwargs)
+
+class _Arg(collections.namedtuple('_Arg', 'opts kwargs completer')):
+  '''Compiled argument'''
+  __slots__ = ()
+
+class _Group(collections.namedtuple('_Group', 'kind args entries')):
+  '''Compiled argument group or mutually exclusive group'''
+  __slots__ = ()
+
+class _SubParser(collections.namedtuple('_SubParser', 'names kwargs callme entries')):
+  '''Compiled sub-parser'''
+  __slots__ = ()
+
+class _SubParsers(collections.namedtuple('_SubParsers', 'kwargs callable_name parsers')):
+  '''Compiled sub-parser group'''
+  __slots__ = ()
+
+class CompiledSpec(collections.namedtuple('CompiledSpec', 'entries digest')):
+  '''Validated, immutable form of a `make_parser` configuration
+
+  Created by `compile_spec`.  It can be passed to `make_parser` in
+  place of the configuration list any number of times.
+  '''
+  __slots__ = ()
+
+def _items(kwargs:dict, *skip:str) -> tuple:
+  '''Freeze a kwargs dict into a tuple of items, leaving out some keys'''
+  if not isinstance(kwargs, dict): raise TypeError(f'Expected dict for options, got {kwargs!r}')
+  return tuple((k, v) for k, v in kwargs.items() if k not in skip)
+
+def _compile_subparsers(subopts:dict, kwargs:list) -> _SubParsers:
+  '''Compile a sub-parser group definition'''
+  parsers = []
+  for sp, spopts in kwargs:
+    names = (sp,) if isinstance(sp, str) else tuple(sp)
+    if not isinstance(spopts, dict) or CFG.ARGS not in spopts:
+      raise ValueError(f'Sub-parser {names[0]}: expected dict with an {CFG.ARGS!r} key')
+    parsers.append(_SubParser(names, _items(spopts, CFG.ARGS, CFG.CALLABLE),
+                              spopts.get(CFG.CALLABLE), _compile(spopts[CFG.ARGS])))
+  return _SubParsers(_items(subopts, CFG.CALLABLE), subopts.get(CFG.CALLABLE, CFG.FUNCTION), tuple(parsers))
+
+def _compile_entry(opts:Any, kwargs:Any):
+  '''Compile one entry of a configuration list'''
+  marker = opts if isinstance(opts, str) else opts[0]
+  if marker in (CFG.OPT_MXGROUP, CFG.REQ_MXGROUP):
+    return _Group(marker, (), _compile(kwargs))
+  if marker == CFG.GROUP:
+    return _Group(marker, () if isinstance(opts, str) else tuple(opts[1:]), _compile(kwargs))
+  if marker == CFG.SUBPARSER:
+    return _compile_subparsers(opts[1], kwargs)
+  return _Arg((opts,) if isinstance(opts, str) else tuple(opts),
+              _items(kwargs, CFG.COMPLETER), kwargs.get(CFG.COMPLETER))
+
+def _compile(argopts:list[Any]) -> tuple:
+  '''Compile a configuration list'''
+  entries = []
+  for entry in argopts:
+    if not isinstance(entry, (list, tuple)) or len(entry) != 2:
+      raise ValueError(f'Expected (opts, kwargs) pair, got {entry!r}')
+    entries.append(_compile_entry(*entry))
+  return tuple(entries)
+
+def _spec_digest(argopts:list[Any]) -> str|None:
+  '''Hash of a configuration, to validate a compiled spec cache
+
+  :returns: hex digest, or None if the configuration can not be pickled
+  '''
+  import hashlib
+  import pickle
+  try:
+    data = pickle.dumps((sys.version_info[:2], argopts), protocol = 4)
+  except (pickle.PicklingError, AttributeError, TypeError):
+    return None
+  return hashlib.sha256(data).hexdigest()
+
+def compile_spec(argopts:list[Any], cache_file:str|None = None) -> CompiledSpec:
+  '''Validate and compile a `make_parser` configuration
+
+  :param argopts: configuration, as accepted by `make_parser`
+  :param cache_file: Optional file where the compiled form is persisted
+  :returns: compiled configuration
+
+  The configuration is not modified.  Pass the returned
+  `CompiledSpec` to `make_parser` to build parsers repeatedly without
+  interpreting the configuration again.  Later changes to the
+  configuration list do not affect it.
+
+  If `cache_file` is given, the compiled form is pickled to it,
+  keyed on a hash of the pickled configuration, so changing the
+  arguments of objects like `argparse.FileType` or
+  `functools.partial` invalidates it.  Functions in the
+  configuration are pickled by reference; configurations that can
+  not be pickled (e.g. using `lambda`) are not cached.
+
+  ```{doctest}
+
+  >>> import mypielib.argparse_cfg as argparse_cfg
+  >>> spec = [('--count', dict(type=int, completer=argparse_cfg.hint_factory('N')))]
+  >>> compiled = argparse_cfg.compile_spec(spec)
+  >>> compiled is argparse_cfg.compile_spec(compiled)
+  True
+  >>> argparse_cfg.make_parser(compiled, prog='a').parse_args(['--count', '3'])
+  Namespace(count=3)
+  >>> argparse_cfg.make_parser(compiled, prog='b').parse_args([])
+  Namespace(count=None)
+  >>> 'completer' in spec[0][1]
+  True
+  >>> argparse_cfg.compile_spec([('--bad',)])
+  Traceback (most recent call last):
+  ValueError: Expected (opts, kwargs) pair, got ('--bad',)
+  >>> import functools, os, tempfile
+  >>> tmpdir = tempfile.TemporaryDirectory()
+  >>> cache = os.path.join(tmpdir.name, 'spec.pickle')
+  >>> for base in (16, 8):
+  ...   spec = [('--n', dict(type=functools.partial(int, base=base)))]
+  ...   print(argparse_cfg.make_parser(argparse_cfg.compile_spec(spec, cache), prog='c').parse_args(['--n', '11']))
+  Namespace(n=17)
+  Namespace(n=9)
+  >>> tmpdir.cleanup()
+
+  ```
+  '''
+  if isinstance(argopts, CompiledSpec): return argopts
+  if cache_file is None: return CompiledSpec(_compile(argopts), None)
+
+  digest = _spec_digest(argopts)
+  if digest is None: return CompiledSpec(_compile(argopts), None)
+  compiled = _load_compiled(cache_file, digest)
+  if compiled is None:
+    compiled = CompiledSpec(_compile(argopts), digest)
+    _save_compiled(cache_file, compiled)
+  return compiled
+
+def _load_compiled(cache_file:str, digest:str) -> CompiledSpec|None:
+  '''Load a compiled spec from cache if it matches `digest`'''
+  import pickle
+  try:
+    with open(cache_file, 'rb') as fp:
+      compiled = pickle.load(fp)
+  except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+    return None
+  if not isinstance(compiled, CompiledSpec) or compiled.digest != digest: return None
+  return compiled
+
+def _save_compiled(cache_file:str, compiled:CompiledSpec):
+  '''Save a compiled spec, ignoring specs that can not be pickled'''
+  import pickle
+  try:
+    data = pickle.dumps(compiled)
+  except (pickle.PicklingError, AttributeError, TypeError):
+    return
+  try:
+    with open(cache_file + '.tmp', 'wb') as fp:
+      fp.write(data)
+    os.replace(cache_file + '.tmp', cache_file)
+  except OSError:
+    pass
+
+class _LazyParserMap(dict):
+  '''Sub-parser name map that adds the sub-parser arguments on first lookup
+
+  `argparse` (and `argcomplete`) look up the selected sub-parser
+  in this map, so only sub-parsers that are actually used get built.
+  '''
+  def __init__(self):
+    super().__init__()
+    self.pending = {}
+
+  def __getitem__(self, name:str) -> argparse.ArgumentParser:
+    subparser = super().__getitem__(name)
+    entries = self.pending.pop(id(subparser), None)
+    if entries is not None: _build(subparser, entries, True)
+    return subparser
+
+def materialize(parser:argparse.ArgumentParser) -> argparse.ArgumentParser:
+  '''Build all the pending sub-parsers of a lazy parser
+
+  :param parser: parser created with `make_parser(..., lazy=True)`
+  :returns: the same parser, fully built
+
+  Needed by tools that inspect the whole parser tree, for example
+  documentation generators.
+  '''
+  for action in parser._actions:
+    if isinstance(action, argparse._SubParsersAction):
+      for name in list(action.choices):
+        materialize(action.choices[name])
   return parser
 
-def _add_subparsers(parser:argparse.ArgumentParser, subopts:dict[Any], kwargs:list[Any]):
+def _add_arg(sub:argparse.ArgumentParser|argparse._MutuallyExclusiveGroup, arg:_Arg):
+  '''Helper function used to load argument options
+
+  :param sub: sub parser
+  :param arg: compiled argument
+
+  Handles completer options.
+  '''
+  action = sub.add_argument(*arg.opts, **dict(arg.kwargs))
+  if arg.completer is not None: action.completer = arg.completer
+
+def _add_subparsers(parser:argparse.ArgumentParser, spec:_SubParsers, lazy:bool = False):
   '''Create sub parser definitions...
+
+  If `lazy` is True, sub-parsers are created but their arguments
+  are only added when the sub-parser is selected.
   '''
-  callable_name = CFG.FUNCTION
-  if CFG.CALLABLE in subopts:
-    callable_name = subopts[CFG.CALLABLE]
-    del subopts[CFG.CALLABLE]
-  subs = parser.add_subparsers(**subopts)
-  for sp, spopts in kwargs:
-    if isinstance(sp,str): sp = [sp]
-    args = spopts[CFG.ARGS]
-    del spopts[CFG.ARGS]
-    if CFG.CALLABLE in spopts:
-      callme = spopts[CFG.CALLABLE]
-      del spopts[CFG.CALLABLE]
+  subs = parser.add_subparsers(**dict(spec.kwargs))
+  if lazy: subs._name_parser_map = subs.choices = _LazyParserMap()
+  for sp in spec.parsers:
+    subparser = subs.add_parser(sp.names[0], aliases=sp.names[1:], **dict(sp.kwargs))
+    if lazy:
+      subs.choices.pending[id(subparser)] = sp.entries
     else:
-      callme = None
-
-    subparser = subs.add_parser(sp[0],aliases=sp[1:], **spopts)
-    make_parser(args, subparser)
-    if callme is not None:
-      subparser.set_defaults(**{callable_name: callme})
+      _build(subparser, sp.entries)
+    if sp.callme is not None:
+      subparser.set_defaults(**{spec.callable_name: sp.callme})
+
+def _build(parser:argparse.ArgumentParser, entries:tuple, lazy:bool = False):
+  '''Add compiled entries to a parser or group'''
+  for entry in entries:
+    if isinstance(entry, _Arg):
+      _add_arg(parser, entry)
+    elif isinstance(entry, _SubParsers):
+      _add_subparsers(parser, entry, lazy)
+    elif entry.kind == CFG.GROUP:
+      _build(parser.add_argument_group(*entry.args), entry.entries)
+    else:
+      _build(parser.add_mutually_exclusive_group(required = entry.kind == CFG.REQ_MXGROUP), entry.entries)
 
 def make_parser(argopts:list[Any],
                 parser:argparse.ArgumentParser|None = None,
+                lazy:bool = False,
                 **kwargs) -> argparse.ArgumentParser:
   '''Configure argparser
 
-  :param argopts: configuration
+  :param argopts: configuration, or a `CompiledSpec` from `compile_spec`
   :param parser: Use this parser instead of creating a new one.
+  :param lazy: If True, sub-parser arguments are only added when the sub-parser is used.
   :param kwargs:  Additional kwargs passwd to ArgumentParser constructor
 
+  Lazy mode helps programs with many sub-commands, as only the
+  selected one gets built.  The top level `--help` only needs the
+  sub-command names, so it is not affected.  Use `materialize` to
+  build the whole tree.
+
+  When creating the parser, `argcomplete` is hooked in after the
+  parser is built, unless `do_not_complete=True` is passed.  If the
+  shell is requesting completions (`CFG.COMPLETION_ENV` is set), lazy
+  mode is forced, so only the sub-parsers on the command line are
+  built, and the process exits once the completions are printed.
+
+  ```{doctest}
+
+  >>> import mypielib.argparse_cfg as argparse_cfg
+  >>> spec = [([argparse_cfg.CFG.SUBPARSER, dict(dest='cmd')], [
+  ...     ('one', dict(help='first', args=[('--flag', dict(action='store_true'))])),
+  ...     ('two', dict(help='second', args=[('--opt', dict())])),
+  ...   ])]
+  >>> parser = argparse_cfg.make_parser(spec, prog='lazy', lazy=True, do_not_complete=True)
+  >>> subs = parser._subparsers._group_actions[0]
+  >>> len(subs.choices.pending)
+  2
+  >>> parser.parse_args(['one', '--flag'])
+  Namespace(cmd='one', flag=True)
+  >>> len(subs.choices.pending)
+  1
+  >>> len(argparse_cfg.materialize(parser)._subparsers._group_actions[0].choices.pending)
+  0
+
+  ```
   '''
+  complete = False
   if parser is None:
+    complete = not kwargs.pop(CFG.DONT_COMPLETE, False)
     parser = _argparser_factory(kwargs)
-
-  for opts,kwargs in argopts:
-    if opts == CFG.OPT_MXGROUP or opts[0] == CFG.OPT_MXGROUP:
-      group = parser.add_mutually_exclusive_group()
-      make_parser(kwargs, group)
-    elif opts == CFG.REQ_MXGROUP or opts[0] == CFG.REQ_MXGROUP:
-      group = parser.add_mutually_exclusive_group(required=True)
-      make_parser(kwargs, group)
-    elif opts == CFG.GROUP or opts[0] == CFG.GROUP:
-      if isinstance(opts,str): opts = [CFG.GROUP]
-      group = parser.add_argument_group(*opts[1:])
-      make_parser(kwargs, group)
-    elif opts[0] == CFG.SUBPARSER:
-      _add_subparsers(parser, opts[1], kwargs)
-    else:
-      _add_arg(parser, opts, kwargs)
-
+  completing = complete and CFG.COMPLETION_ENV in os.environ
+  _build(parser, compile_spec(argopts).entries, lazy or completing)
+  if complete: argcomplete.autocomplete(parser)
   return parser
 
+def _load_config_file(filename:str) -> dict:
+  '''Load a JSON or YAML configuration file'''
+  if filename.endswith(('.yaml', '.yml')):
+    from mypielib.yamu import load_yaml
+    data = load_yaml(filename)
+  else:
+    from mypielib.jsonu import load_json
+    data = load_json(filename)
+  if data is None: return {}
+  if not isinstance(data, dict): raise ValueError(f'{filename}: configuration must be a mapping')
+  return data
+
+def _config_key(files:list[str]) -> list:
+  '''Cache key for configuration files: path, mtime and size of each'''
+  key = []
+  for filename in files:
+    try:
+      st = os.stat(filename)
+      key.append([filename, st.st_mtime_ns, st.st_size])
+    except OSError:
+      key.append([filename, None, None])
+  return key
+
+def load_config_layers(files:list[str], cache_file:str|None = None) -> dict:
+  '''Load and merge configuration files
+
+  :param files: JSON or YAML files, from lowest to highest precedence.  Missing files are skipped.
+  :param cache_file: Optional file where the merged result is cached
+  :returns: merged configuration
+
+  Files are merged with `mypielib.arrayu.merge_recursive`.  The
+  cache is keyed on the path, modification time and size of each
+  file, so when nothing changed only the cache file is read.
+  Results that don't survive a JSON round trip unchanged (e.g.
+  with dates or non-string keys) are not cached, so a cache hit
+  returns the same data as a fresh load.
+  '''
+  import json
+  from mypielib.arrayu import merge_recursive
+
+  key = _config_key(files)
+  if cache_file is not None:
+    try:
+      with open(cache_file, 'r') as fp:
+        cache = json.load(fp)
+      if cache['key'] == key: return cache['config']
+    except (OSError, ValueError, KeyError, TypeError):
+      pass
+
+  layers = [_load_config_file(filename) for (filename, mtime, _) in key if mtime is not None]
+  config = merge_recursive(*layers)
+  if cache_file is not None: _save_config_cache(cache_file, key, config)
+  return config
+
+def _save_config_cache(cache_file:str, key:list, config:dict):
+  '''Cache a merged configuration, unless JSON can't represent it exactly'''
+  import json
+  try:
+    text = json.dumps({'key': key, 'config': config})
+  except (TypeError, ValueError):
+    return
+  if json.loads(text)['config'] != config: return
+  try:
+    with open(cache_file + '.tmp', 'w') as fp:
+      fp.write(text)
+    os.replace(cache_file + '.tmp', cache_file)
+  except OSError:
+    pass
+
+def _env_value(action:argparse.Action, value:str) -> Any:
+  '''Convert an environment variable value for an argument'''
+  from mypielib.boolval import boolval
+
+  if isinstance(action, argparse._CountAction): return int(value)
+  if isinstance(action, argparse._AppendConstAction):
+    return [action.const] if boolval(value) else action.default
+  if action.nargs == 0:
+    if isinstance(action.const, bool): return boolval(value)  # store_true/store_false
+    return action.const if boolval(value) else action.default
+  if callable(action.type): return action.type(value)
+  return value
+
+def env_defaults(parser:argparse.ArgumentParser, prefix:str, environ:dict[str,str]|None = None) -> dict:
+  '''Get defaults for a parser from environment variables
+
+  :param parser: parser to get the destinations from
+  :param prefix: environment variable prefix
+  :param environ: environment to use, defaults to `os.environ`
+  :returns: dict with the defaults found
+
+  The variable for an option is the prefix followed by its `dest`
+  in upper case, e.g. `MYTOOL_MAX_PROCS` for `dest='max_procs'`.
+  Values are converted with the option's `type`.  `count` options
+  take a number.  `store_true` and `store_false` options take the
+  value of `dest` as a boolean string (see `mypielib.boolval`),
+  other constant options a boolean string telling if the constant
+  is set.  Invalid values are reported with `parser.error`.
+
+  ```{doctest}
+
+  >>> import mypielib.argparse_cfg as argparse_cfg
+  >>> parser = argparse_cfg.make_parser([
+  ...     ('-v', dict(action='count', dest='verbose')),
+  ...     ('--port', dict(type=int)),
+  ...   ], prog='envtest', do_not_complete=True)
+  >>> argparse_cfg.env_defaults(parser, 'X_', {'X_VERBOSE': '2', 'X_PORT': '80'})
+  {'verbose': 2, 'port': 80}
+  >>> argparse_cfg.env_defaults(parser, 'X_', {'X_PORT': 'abc'})
+  Traceback (most recent call last):
+  SystemExit: 2
+
+  ```
+  '''
+  if environ is None: environ = os.environ
+  defaults = {}
+  for action in parser._actions:
+    if not action.option_strings or action.dest == argparse.SUPPRESS: continue
+    var = prefix + action.dest.upper()
+    if var not in environ: continue
+    try:
+      defaults[action.dest] = _env_value(action, environ[var])
+    except (ValueError, TypeError, argparse.ArgumentTypeError) as err:
+      parser.error(f'{var}: invalid value {environ[var]!r}: {err}')
+  return defaults
+
+def set_layered_defaults(parser:argparse.ArgumentParser, files:list[str] = (),
+                         env_prefix:str|None = None, cache_file:str|None = None,
+                         environ:dict[str,str]|None = None) -> dict:
+  '''Set parser defaults from configuration files and environment variables
+
+  :param parser: parser to configure
+  :param files: JSON or YAML files, from lowest to highest precedence (e.g. `/etc`, user, project)
+  :param env_prefix: If given, environment variables with this prefix override the files
+  :param cache_file: Optional file where the merged file configuration is cached
+  :param environ: environment to use, defaults to `os.environ`
+  :returns: defaults applied to the parser
+
+  Precedence, from lowest to highest: argument defaults, files in
+  order, environment variables, command line.  Configuration keys
+  are mapped to `dest` names replacing `-` with `_`.  Keys that
+  don't match the `dest` of any argument are ignored.
+
+  ```{doctest}
+
+  >>> import os, tempfile
+  >>> import mypielib.argparse_cfg as argparse_cfg
+  >>> from mypielib.jsonu import save_json
+  >>> tmpdir = tempfile.TemporaryDirectory()
+  >>> etc, user = os.path.join(tmpdir.name, 'etc.json'), os.path.join(tmpdir.name, 'user.json')
+  >>> save_json(etc, {'host': 'etc.example.com', 'port': 80, 'dry-run': False, 'logging': {'level': 1}})
+  >>> save_json(user, {'port': 8080})
+  >>> parser = argparse_cfg.make_parser([
+  ...     ('--host', dict()),
+  ...     ('--port', dict(type=int)),
+  ...     ('--dry-run', dict(action='store_true')),
+  ...   ], prog='layered', do_not_complete=True)
+  >>> argparse_cfg.set_layered_defaults(parser, [etc, user], 'LAYERED_',
+  ...             cache_file=os.path.join(tmpdir.name, 'cache.json'),
+  ...             environ={'LAYERED_DRY_RUN': 'yes'})
+  {'host': 'etc.example.com', 'port': 8080, 'dry_run': True}
+  >>> parser.parse_args(['--port', '22'])
+  Namespace(host='etc.example.com', port=22, dry_run=True)
+
+  ```
+  '''
+  config = load_config_layers(list(files), cache_file)
+  dests = {action.dest for action in parser._actions}
+  defaults = {key.replace('-', '_'): value for key, value in config.items()}
+  defaults = {dest: value for dest, value in defaults.items() if dest in dests}
+  if env_prefix is not None: defaults.update(env_defaults(parser, env_prefix, environ))
+  parser.set_defaults(**defaults)
+  return defaults
 
 
 if __name__ == '__main__':
@@ -2,7 +2,10 @@
 PHP array like functions and other structure like
 stuff.
 '''
-from typing import Callable, Any
+import functools
+from collections.abc import Mapping, MutableMapping
+from itertools import chain, repeat
+from typing import Callable, Any, Iterable, Iterator
 import sys
 
 LOWER = 0
@@ -78,6 +81,118 @@ def flip(array:dict) -> dict:
   return dict((v, k) for k, v in array.items())
 
 
+class FrozenDict(Mapping):
+  '''Immutable dict with a cached hash
+
+  :param args: same as `dict`
+
+  Values should be immutable too, see `freeze`.  The hash is
+  computed on first use and remembered.
+
+  Examples:
+
+  ```{doctest}
+
+  >>> import mypielib.arrayu as arrayu
+  >>> fd = arrayu.FrozenDict(a = 1, b = (2, 3))
+  >>> fd['b'], fd == {'a': 1, 'b': (2, 3)}, hash(fd) == hash(arrayu.FrozenDict(b = (2, 3), a = 1))
+  ((2, 3), True, True)
+  >>> fd['c'] = 4
+  Traceback (most recent call last):
+  TypeError: 'FrozenDict' object does not support item assignment
+
+  ```
+  '''
+  __slots__ = ('_data', '_hash')
+
+  def __init__(self, *args, **kwargs):
+    self._data = dict(*args, **kwargs)
+    self._hash = None
+
+  def __getitem__(self, key:Any) -> Any:
+    return self._data[key]
+
+  def __contains__(self, key:Any) -> bool:
+    return key in self._data
+
+  def __iter__(self) -> Iterator:
+    return iter(self._data)
+
+  def __len__(self) -> int:
+    return len(self._data)
+
+  def keys(self):
+    return self._data.keys()
+
+  def values(self):
+    return self._data.values()
+
+  def items(self):
+    return self._data.items()
+
+  def __hash__(self) -> int:
+    if self._hash is None: self._hash = hash(frozenset(self._data.items()))
+    return self._hash
+
+  def __eq__(self, other:object) -> bool:
+    if isinstance(other, FrozenDict):
+      if self._hash is not None and other._hash is not None and self._hash != other._hash: return False
+      return self._data == other._data
+    if isinstance(other, Mapping): return self._data == dict(other.items())
+    return NotImplemented
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__}({self._data!r})'
+
+  def __reduce__(self):
+    return (self.__class__, (self._data,))
+
+class FrozenList(tuple):
+  '''Tuple with a cached hash, used by `freeze` for lists'''
+  def __hash__(self) -> int:
+    try:
+      return self._hash
+    except AttributeError:
+      self._hash = super().__hash__()
+      return self._hash
+
+  def __repr__(self) -> str:
+    return f'{self.__class__.__name__}({list(self)!r})'
+
+MAPPINGS = (dict, FrozenDict)
+'''Types walked as mappings'''
+
+def _merge_values(values:list, stack:list, parent:dict, key:Any) -> Any:
+  '''Merge the values found for a key in several layers
+
+  :param values: values, in layer order
+  :param stack: pending `(target, layers, parent, key)` dict merges
+  :param parent: dict the value is for
+  :param key: key the value is for
+  :returns: merged value
+
+  Only the trailing run of values of the same kind matters: an
+  earlier value of a different kind would be replaced anyway.
+  '''
+  last = values[-1]
+  if isinstance(last, MAPPINGS):
+    kind = MAPPINGS
+  elif isinstance(last, (list, tuple)):
+    kind = (list, tuple)
+  else:
+    return last
+  start = len(values) - 1
+  while start > 0 and isinstance(values[start - 1], kind): start -= 1
+  if start == len(values) - 1: return last  # Nothing to merge, share it
+
+  if kind is MAPPINGS:
+    merged = {}
+    stack.append((merged, values[start:], parent, key))
+    return merged
+  items = chain.from_iterable(reversed(values[start:]))
+  if hasattr(last, '_make'): return tuple(items)  # namedtuple fields don't fit the concatenation
+  return type(last)(items)
+
 def merge_recursive(*arrays:list[dict]) -> dict:
   '''Merge one or more dicts recursively
 
@@ -91,8 +206,16 @@ def merge_recursive(*arrays:list[dict]) -> dict:
   these keys are merged together into an dict, and this is done
   recursively, so that if one of the values is a dict itself, the
   function will merge it with a corresponding entry in another dict
-  too. If, however, the dicts have the same numeric key, the later
-  value will not overwrite the original value, but will be appended.
+  too.  Lists (and tuples) for the same key are concatenated, with
+  the later value first.  Any other value replaces the previous one.
+
+  The inputs are never modified.  Values that do not need merging
+  are shared with the inputs instead of being copied, so modifying
+  nested values of the result modifies the inputs too.  This is
+  safe with `freeze`d inputs: `FrozenDict`s are merged like dicts,
+  and the merge of `FrozenDict`s only is a `FrozenDict`.  Nesting is
+  handled with an explicit stack, and each input is visited once,
+  so the cost is linear in the total size of the inputs.
 
   This is similar to PHP's [array_merge_recursive](https://www.php.net/manual/en/function.array-merge-recursive.php)
 
@@ -106,29 +229,132 @@ def merge_recursive(*arrays:list[dict]) -> dict:
   >>> a2 = dict(diez = 10, color = dict(favorite='green', hated='blue'))
   >>> phparray.merge_recursive(a1, a2)
   {'color': {'favorite': 'green', 'hated': 'blue'}, 'five': 5, 'diez': 10}
+  >>> a1
+  {'color': {'favorite': 'red'}, 'five': 5}
+  >>> a3 = dict(hosts = ['b'], nested = dict(deep = dict(x = 1)))
+  >>> merged = phparray.merge_recursive(dict(hosts = ['a']), a3)
+  >>> merged
+  {'hosts': ['b', 'a'], 'nested': {'deep': {'x': 1}}}
+  >>> merged['nested'] is a3['nested']
+  True
+  >>> from collections import namedtuple
+  >>> Point = namedtuple('Point', 'x y')
+  >>> phparray.merge_recursive(dict(p = Point(1, 2)), dict(p = Point(3, 4)))
+  {'p': (3, 4, 1, 2)}
+  >>> base = phparray.freeze(dict(db = dict(port = 5432), hosts = ['a']))
+  >>> phparray.merge_recursive(base, phparray.freeze(dict(db = dict(user = 'app'))))
+  FrozenDict({'db': FrozenDict({'port': 5432, 'user': 'app'}), 'hosts': FrozenList(['a'])})
+
+  ```
+  '''
+  result = {}
+  frozen = []
+  stack = [(result, arrays, None, None)]
+  while len(stack):
+    target, layers, parent, key = stack.pop()
+    if len(layers) and all(isinstance(layer, FrozenDict) for layer in layers):
+      frozen.append((target, parent, key))
+    clashes = {}
+    for array in layers:
+      for key, value in array.items():
+        if key in target:
+          if key in clashes:
+            clashes[key].append(value)
+          else:
+            clashes[key] = [target[key], value]
+        target[key] = value
+    for key, values in clashes.items():
+      target[key] = _merge_values(values, stack, target, key)
+
+  for target, parent, key in reversed(frozen):  # Nested dicts first
+    if parent is None:
+      result = FrozenDict(target)
+    else:
+      parent[key] = FrozenDict(target)
+  return result
 
+SEQUENCES = (list, tuple, set, frozenset)
+'''Types walked as sequences by `walk`, `traverse` and `transform`'''
+CONTAINERS = (*MAPPINGS, *SEQUENCES)
+'''Types walked as containers'''
+EXECUTOR_THREAD = 'thread'
+'''`transform` executor: new thread pool'''
+EXECUTOR_PROCESS = 'process'
+'''`transform` executor: new process pool'''
+TRANSFORM_BATCH = 256
+'''Default number of leaves per `transform` executor task'''
+VECTOR_MIN = 64
+'''Default minimum size of the numeric lists vectorized by `transform`'''
+VECTOR_INT_MAX = 2 ** 31
+'''Ints are vectorized only below this magnitude, so that NumPy's int64 arithmetic has room'''
+
+def _children(node:Any) -> Iterator|None:
+  '''Iterate over the `(key, value)` pairs of a container, None for leaves'''
+  if isinstance(node, MAPPINGS): return iter(node.items())
+  if isinstance(node, SEQUENCES): return enumerate(node)
+  return None
+
+def walk(data:Any) -> Iterator[tuple[tuple, Any]]:
+  '''
+  Lazily walk a nested structure of dicts, lists, tuples and sets
+
+  :param data: The input data structure
+  :returns: generator of `(path, leaf)` pairs
+
+  The path is a tuple with the dict keys and sequence indexes
+  leading to the leaf.  Set members are numbered in iteration
+  order.  Leaves are produced depth first, in order, as they are
+  reached, so the caller can filter or stop early without walking
+  the whole structure.  Nesting depth is not limited by the
+  recursion limit.
+
+  Examples:
+
+  ```{doctest}
+
+  >>> import mypielib.arrayu as arrayu
+  >>> for path, leaf in arrayu.walk({'a': [1, (2, 3)], 'b': {'c': 'x'}}): print(path, leaf)
+  ('a', 0) 1
+  ('a', 1, 0) 2
+  ('a', 1, 1) 3
+  ('b', 'c') x
+  >>> next(path for path, leaf in arrayu.walk({'a': [1, 2], 'b': 2}) if leaf == 2)
+  ('a', 1)
+  >>> list(arrayu.walk('scalar'))
+  [((), 'scalar')]
 
   ```
   '''
-  array1 = dict()
-  for array in arrays:
-    for key, value in array.items():
-      if key in array1:
-        if isinstance(value, dict):
-          array[key] = merge_recursive(array1[key], value)
-        if isinstance(value, (list, tuple)):
-          array[key] += array1[key]
-    array1.update(array)
-  return array1
+  children = _children(data)
+  if children is None:
+    yield (), data
+    return
+  path = []
+  stack = [children]
+  while len(stack):
+    for key, value in stack[-1]:
+      sub = _children(value)
+      if sub is None:
+        yield (*path, key), value
+      else:
+        path.append(key)
+        stack.append(sub)
+        break
+    else:
+      stack.pop()
+      if len(path): path.pop()
 
 def traverse(data:Any, callback:Callable[[Any],None]):
   '''
-  Recursively walk a nested structure of dicts and lists,
+  Walk a nested structure of dicts, lists, tuples and sets,
   applying the `callback` function to each leaf node.
 
   :param data: The input data structure, which may be a dict, list, or any other type.
   :param callback: function to call
 
+  Nesting depth is not limited by the recursion limit.  Use `walk`
+  to get the path of each leaf.
+
   Examples:
 
   ```{doctest}
@@ -142,25 +368,207 @@ def traverse(data:Any, callback:Callable[[Any],None]):
   2
   3
   4
+  >>> deep = []
+  >>> node = deep
+  >>> for i in range(100000): node.append([]); node = node[0]
+  >>> node.append('bottom')
+  >>> arrayu.traverse(deep, runme)
+  bottom
 
   ```
   '''
-  if isinstance(data, dict):
-    for key, value in data.items():
-      traverse(value, callback)
-  elif isinstance(data, list):
-    for item in data:
-      traverse(item, callback)
+  stack = [iter((data,))]
+  while len(stack):
+    for value in stack[-1]:
+      if isinstance(value, MAPPINGS):
+        stack.append(iter(value.values()))
+        break
+      if isinstance(value, SEQUENCES):
+        stack.append(iter(value))
+        break
+      callback(value)
+    else:
+      stack.pop()
+
+def _rebuild(orig:tuple|frozenset, items:list) -> tuple|frozenset:
+  '''Create an immutable sequence like `orig` with new items'''
+  if hasattr(orig, '_make'): return orig._make(items)  # namedtuple
+  return type(orig)(items)
+
+def _copy_frame(target:Any, key:Any, value:Any) -> tuple:
+  '''Create a `_leaves` stack frame for a mutable copy of an immutable container or set'''
+  if isinstance(value, FrozenDict):
+    items = dict(value)
+    return (items, iter(list(items.items())), (target, key, value))
+  items = list(value)
+  return (items, enumerate(items), (target, key, value))
+
+def _write_back(items:list|dict, parent:dict|list|None, key:Any, orig:tuple|set|frozenset|FrozenDict):
+  '''Store transformed tuple, set or FrozenDict members if any of them changed'''
+  if isinstance(orig, FrozenDict):
+    if any(items[k] is not v for k, v in orig.items()): parent[key] = orig.__class__(items)
+    return
+  if all(new is old for new, old in zip(items, orig)): return
+  if isinstance(orig, set):
+    new = set(items) # may raise TypeError, leave `orig` untouched then
+    orig.clear()
+    orig.update(new)
   else:
-    callback(data)
+    parent[key] = _rebuild(orig, items)
+
+def _is_numeric(value:list|tuple, min_size:int) -> bool:
+  '''Check if a sequence is large enough and only contains floats, or only small ints'''
+  if len(value) < min_size: return False
+  types = set(map(type, value))
+  if types == {float}: return True
+  return types == {int} and -VECTOR_INT_MAX < min(value) and max(value) < VECTOR_INT_MAX
+
+def _root_frame(data:list|dict|set) -> tuple:
+  '''Create the first `_leaves` stack frame: `(container, children, finish)`'''
+  if isinstance(data, dict): return (data, iter(list(data.items())), None)
+  if isinstance(data, list): return (data, enumerate(data), None)
+  if isinstance(data, set): return _copy_frame(None, None, data)
+  raise TypeError('Only dict, list or set allowed')
 
-def transform(data:list|dict, callback:Callable[[Any],Any]):
+def _leaves(data:list|dict|set, finishes:list|None = None, vectors:list|None = None,
+            vector_min:int = VECTOR_MIN) -> Iterator[tuple[Any, Any, Any]]:
+  '''Iterate over the leaves of a structure for `transform`
+
+  :param data: dict, list or set to walk
+  :param finishes: If None, tuples and sets are rebuilt as soon as their members were seen, otherwise the pending rebuilds are appended to it
+  :param vectors: If not None, numeric lists and tuples are appended to it instead of walked
+  :param vector_min: minimum size of the numeric lists and tuples to append to `vectors`
+  :returns: generator of `(container, key, value)`, where `container[key]` can be assigned
   '''
-  Recursively walk a nested structure of dicts and lists,
+  stack = [_root_frame(data)]
+  while len(stack):
+    target, children, finish = stack[-1]
+    for key, value in children:
+      if isinstance(value, dict):
+        stack.append((value, iter(list(value.items())), None))  # Snapshot, the callback may modify it
+        break
+      if vectors is not None and isinstance(value, (list, tuple)) and _is_numeric(value, vector_min):
+        vectors.append((target, key, value))
+        continue
+      if isinstance(value, list):
+        stack.append((value, enumerate(value), None))
+        break
+      if isinstance(value, CONTAINERS):  # Immutable or set
+        stack.append(_copy_frame(target, key, value))
+        break
+      yield target, key, value
+    else:
+      stack.pop()
+      if finish is None: continue
+      if finishes is None:
+        _write_back(target, *finish)
+      else:
+        finishes.append((target, finish))
+
+def _apply_batch(callback:Callable[[Any],Any], values:list) -> list:
+  '''Apply a callback to a batch of leaves'''
+  return [callback(value) for value in values]
+
+def _picklable(obj:Any) -> bool:
+  '''Check if an object can be sent to another process'''
+  import pickle
+  try:
+    pickle.dumps(obj)
+  except (pickle.PicklingError, TypeError, AttributeError):
+    return False
+  return True
+
+def _map_batches(executor:Any, callback:Callable[[Any],Any], values:list, batch_size:int) -> list:
+  '''Apply a callback to values in batches using an executor
+
+  :returns: results in the same order as `values`
+  '''
+  from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+  if executor == EXECUTOR_PROCESS:
+    executor = EXECUTOR_PROCESS if _picklable(callback) else EXECUTOR_THREAD
+  elif isinstance(executor, ProcessPoolExecutor) and not _picklable(callback):
+    raise TypeError('callback can not be pickled for a process pool')
+
+  batches = [values[i:i + batch_size] for i in range(0, len(values), batch_size)]
+  task = functools.partial(_apply_batch, callback)
+  if executor == EXECUTOR_PROCESS:
+    with ProcessPoolExecutor() as pool: results = list(pool.map(task, batches))
+  elif executor == EXECUTOR_THREAD:
+    with ThreadPoolExecutor() as pool: results = list(pool.map(task, batches))
+  elif isinstance(executor, str):
+    raise ValueError(f'executor {executor} should be {EXECUTOR_THREAD} or {EXECUTOR_PROCESS}')
+  else:
+    results = list(executor.map(task, batches))
+  return list(chain.from_iterable(results))
+
+def _numpy() -> Any:
+  '''Import NumPy on demand, it is slow to import
+
+  :returns: numpy module or None if it is not installed
+  '''
+  try:
+    import numpy
+  except ImportError:
+    return None
+  return numpy
+
+def _apply_vector(numpy:Any, callback:Callable[[Any],Any], target:Any, key:Any, value:list|tuple):
+  '''Apply a vectorized callback to a numeric list or tuple'''
+  array = numpy.asarray(value, dtype = numpy.float64 if isinstance(value[0], float) else numpy.int64)
+  results = numpy.asarray(callback(array)).tolist()
+  if isinstance(value, list):
+    value[:] = results
+  else:
+    target[key] = _rebuild(value, results)
+
+def _apply_leaves(leaves:Iterator, callback:Callable[[Any],Any], executor:Any, batch_size:int):
+  '''Apply a callback to the leaves from `_leaves`, serially or with an executor'''
+  if executor is None:
+    for target, key, value in leaves:
+      newitem = callback(value)
+      if newitem is not value: target[key] = newitem
+    return
+  slots = list(leaves)
+  results = _map_batches(executor, callback, [value for _, _, value in slots], batch_size)
+  for (target, key, value), newitem in zip(slots, results):
+    if newitem is not value: target[key] = newitem
+
+def transform(data:list|dict|set, callback:Callable[[Any],Any], executor:Any = None,
+              batch_size:int = TRANSFORM_BATCH, vectorize:bool = False, vector_min:int = VECTOR_MIN):
+  '''
+  Walk a nested structure of dicts, lists, tuples and sets,
   applying a transformation to each leaf node using the `callback` function.
 
-  :param data: The input data structure, which may be a dict, list, or any other type.
+  :param data: The input data structure, a dict, list or set
   :param callback: function to call
+  :param executor: `concurrent.futures.Executor`, or EXECUTOR_THREAD or EXECUTOR_PROCESS to use a new pool.  None to call `callback` serially.
+  :param batch_size: number of leaves sent to the executor per task
+  :param vectorize: If True, `callback` is a NumPy ufunc or vectorized callable, applied to whole numeric lists and tuples
+  :param vector_min: minimum size of the numeric lists and tuples to vectorize
+
+  The structure is modified in place.  Nested tuples, frozensets
+  and `FrozenDict`s are immutable, so they are replaced with new
+  ones when any of their members change.  Nesting depth is not limited by the
+  recursion limit.
+
+  With an `executor`, leaves are collected first and sent in
+  batches, in order, to the executor.  The results are written
+  back once all batches are done, so the outcome is the same as
+  a serial run.  Process pools require a callback that can be
+  pickled: EXECUTOR_PROCESS falls back to threads otherwise, and
+  a `ProcessPoolExecutor` raises TypeError before anything is
+  modified.
+
+  With `vectorize`, lists and tuples of at least `vector_min`
+  floats, or ints smaller than `VECTOR_INT_MAX`, are converted to
+  a NumPy float64 or int64 array, passed to `callback` as a whole
+  and converted back.  int64 arithmetic wraps around silently, so
+  `callback` must keep int results within 2**63.  Other leaves,
+  including lists mixing ints and floats, and all leaves when
+  NumPy is not installed, are passed one by one, so `callback`
+  must accept both arrays and scalars.  Numeric lists are updated
+  in place, after all other leaves.
 
   Examples:
 
@@ -176,25 +584,39 @@ def transform(data:list|dict, callback:Callable[[Any],Any]):
   >>> arrayu.transform(inp, lambda val: greeter(val, 'Alice'))
   >>> inp
   ['Alice greets ONE', 'Alice greets TWO', {'uno': 'Alice greets WOT', 'dos': 'Alice greets NOT'}, [3, 4, 'Alice greets YES', 'Alice greets MAYBE']]
+  >>> inp = {'pair': ('a', 1), 'tags': {'x'}}
+  >>> arrayu.transform(inp, runme)
+  >>> inp
+  {'pair': ('A', 1), 'tags': {'X'}}
+  >>> inp = {'secrets': ['a', 'b', ('c', 'd')], 'plain': 'e'}
+  >>> arrayu.transform(inp, str.upper, executor = arrayu.EXECUTOR_THREAD, batch_size = 2)
+  >>> inp
+  {'secrets': ['A', 'B', ('C', 'D')], 'plain': 'E'}
+  >>> from concurrent.futures import ProcessPoolExecutor
+  >>> with ProcessPoolExecutor(1) as pool: arrayu.transform(inp, lambda x: x, executor = pool)
+  Traceback (most recent call last):
+  TypeError: callback can not be pickled for a process pool
+  >>> inp = {'metrics': [1.0, 2.5, 4.0], 'counts': [2**62, 1], 'mixed': [1, 2.5], 'name': 'cpu'}
+  >>> arrayu.transform(inp, lambda x: x * 2, vectorize = True, vector_min = 2)
+  >>> inp
+  {'metrics': [2.0, 5.0, 8.0], 'counts': [9223372036854775808, 2], 'mixed': [2, 5.0], 'name': 'cpucpu'}
 
   ```
   '''
-  if isinstance(data, dict):
-    for key in list(data.keys()):  # Avoid RuntimeError during mutation
-      if isinstance(data[key],dict) or isinstance(data[key],list):
-        transform(data[key], callback)
-      else:
-        newitem = callback(data[key])
-        if newitem != data[key]: data[key] = newitem
-  elif isinstance(data, list):
-    for i in range(len(data)):
-      if isinstance(data[i],dict) or isinstance(data[i],list):
-        transform(data[i], callback)
-      else:
-        newitem = callback(data[i])
-        if newitem != data[i]: data[i] = newitem
+  numpy = _numpy() if vectorize else None
+  vectors = None if numpy is None else []
+  finishes = None if executor is None and vectors is None else []
+  if vectors is not None and isinstance(data, list) and _is_numeric(data, vector_min):
+    vectors.append((None, None, data))
+    leaves = iter(())
   else:
-    raise TypeError('Only dict or list allowed')
+    leaves = _leaves(data, finishes, vectors, vector_min)
+
+  _apply_leaves(leaves, callback, executor, batch_size)
+  for target, key, value in vectors or ():
+    _apply_vector(numpy, callback, target, key, value)
+  for items, finish in finishes or ():
+    _write_back(items, *finish)
 
 def add_uniq(lst:list, value:Any) -> bool:
   '''Append a value to a list only if doesn't exist already
@@ -203,6 +625,9 @@ def add_uniq(lst:list, value:Any) -> bool:
   :param value: value to append
   :returns: True if lst was modified, else False
 
+  This scans `lst`, so building a large list with it is quadratic.
+  Pass an `OrderedUniqueList` to check membership in constant time.
+
   Examples:
 
   ```{doctest}
@@ -224,6 +649,147 @@ def add_uniq(lst:list, value:Any) -> bool:
   lst.append(value)
   return True
 
+class OrderedUniqueList(list):
+  '''List with a hash index for constant time membership tests
+
+  :param iterable: initial values, duplicates are dropped
+
+  It is a `list`, keeps insertion order, and all list operations
+  keep the index up to date.  `in`, `add_uniq` and `extend_uniq`
+  use the index for hashable values.  Unhashable values are kept
+  aside and checked by scanning, so they work, but slowly.
+
+  Only `extend_uniq` and `add_uniq` skip duplicates: like a
+  regular list, `append`, `extend` and `insert` don't.
+
+  Examples:
+
+  ```{doctest}
+
+  >>> import mypielib.arrayu as arrayu
+  >>> hosts = arrayu.OrderedUniqueList(['web1', 'web2', 'web1'])
+  >>> hosts
+  ['web1', 'web2']
+  >>> arrayu.add_uniq(hosts, 'web2')
+  False
+  >>> hosts.extend_uniq(['db1', 'web1', 'db1', ['unhashable']])
+  2
+  >>> hosts
+  ['web1', 'web2', 'db1', ['unhashable']]
+  >>> ['unhashable'] in hosts, 'db1' in hosts
+  (True, True)
+  >>> hosts.remove('web1')
+  >>> 'web1' in hosts, isinstance(hosts, list)
+  (False, True)
+
+  ```
+  '''
+  def __init__(self, iterable:Iterable = ()):
+    super().__init__()
+    self._counts = {}
+    self._unhashable = []
+    self.extend_uniq(iterable)
+
+  def __reduce__(self):
+    return (self.__class__, (), None, iter(self))
+
+  def _index(self, value:Any):
+    '''Add a value to the index'''
+    try:
+      self._counts[value] = self._counts.get(value, 0) + 1
+    except TypeError:
+      self._unhashable.append(value)
+
+  def _unindex(self, value:Any):
+    '''Remove a value from the index'''
+    try:
+      count = self._counts[value]
+    except TypeError:
+      self._unhashable.remove(value)
+      return
+    if count > 1:
+      self._counts[value] = count - 1
+    else:
+      del self._counts[value]
+
+  def _reindex(self):
+    '''Rebuild the index'''
+    self._counts = {}
+    self._unhashable = []
+    for value in self: self._index(value)
+
+  def __contains__(self, value:Any) -> bool:
+    try:
+      if value in self._counts: return True
+    except TypeError:
+      return super().__contains__(value)
+    return len(self._unhashable) > 0 and value in self._unhashable
+
+  def append(self, value:Any):
+    super().append(value)
+    self._index(value)
+
+  def extend(self, values:Iterable):
+    values = list(values)
+    super().extend(values)
+    for value in values: self._index(value)
+
+  def __iadd__(self, values:Iterable) -> 'OrderedUniqueList':
+    self.extend(values)
+    return self
+
+  def __imul__(self, count:int) -> 'OrderedUniqueList':
+    super().__imul__(count)
+    self._reindex()
+    return self
+
+  def insert(self, index:int, value:Any):
+    super().insert(index, value)
+    self._index(value)
+
+  def pop(self, index:int = -1) -> Any:
+    value = super().pop(index)
+    self._unindex(value)
+    return value
+
+  def remove(self, value:Any):
+    del self[self.index(value)]
+
+  def clear(self):
+    super().clear()
+    self._counts = {}
+    self._unhashable = []
+
+  def __delitem__(self, index:int|slice):
+    removed = self[index] if isinstance(index, slice) else [self[index]]
+    super().__delitem__(index)
+    for value in removed: self._unindex(value)
+
+  def __setitem__(self, index:int|slice, value:Any):
+    removed = self[index] if isinstance(index, slice) else [self[index]]
+    added = list(value) if isinstance(index, slice) else [value]
+    super().__setitem__(index, added if isinstance(index, slice) else value)
+    for old in removed: self._unindex(old)
+    for new in added: self._index(new)
+
+  def copy(self) -> 'OrderedUniqueList':
+    new = self.__class__()
+    new.extend(self)
+    return new
+
+  def extend_uniq(self, values:Iterable) -> int:
+    '''Append the values not yet in the list
+
+    :param values: values to add
+    :returns: number of values added
+    '''
+    added = 0
+    for value in values:
+      if value not in self:
+        self.append(value)
+        added += 1
+    return added
+
 class LtPython3_7Error(Exception):
   pass
 
@@ -250,13 +816,521 @@ def sort_structure(obj:Any) -> Any:
     """
     if sys.version_info < (3,7):
       raise LtPython3_7Error('Calling sort_structure requires version Python 3.7 or newer!\n')
-    if isinstance(obj, dict):
-      return {k: sort_structure(obj[k]) for k in sorted(obj)}
-    elif isinstance(obj, list):
-      return [sort_structure(item) for item in obj]
+    return _sort_structure(obj)
+
+def _sort_structure(obj:Any) -> Any:
+  '''`sort_structure` without the version check'''
+  if isinstance(obj, dict):
+    return {k: _sort_structure(obj[k]) for k in sorted(obj)}
+  elif isinstance(obj, list):
+    return [_sort_structure(item) for item in obj]
+  else:
+    return obj
+
+FINGERPRINT_SIZE = 16
+'''Size in bytes of the `fingerprint` digests'''
+
+def _leaf_text(value:Any) -> str:
+  '''Encode a leaf for `fingerprint`: type name, length and value'''
+  kind = type(value)
+  text = value if kind is str else repr(value)
+  return f'{kind.__name__}:{len(text)}:{text}'
+
+def _fingerprint_frame(node:Any, prefix:str) -> tuple:
+  '''Create a `fingerprint` stack frame for a container
+
+  :returns: `(node, prefix, chunks, emit, children)`
+  '''
+  if isinstance(node, MAPPINGS):
+    children = iter(sorted((_leaf_text(k), v) for k, v in node.items()))
+  else:
+    children = zip(repeat(''), node)
+  chunks = []
+  return (node, prefix, chunks, chunks.append, children)
+
+def _fingerprint_digest(blake2b:Callable, node:Any, chunks:list[str]) -> str:
+  '''Hash the encoded children of a container'''
+  if isinstance(node, (set, frozenset)): chunks.sort()  # Members are hashed in sorted order
+  chunks.insert(0, type(node).__name__)
+  data = ''.join(chunks).encode('utf-8', 'surrogatepass')
+  return '#' + blake2b(data, digest_size = FINGERPRINT_SIZE).hexdigest()
+
+def fingerprint(obj:Any, memo:dict|None = None) -> str:
+  '''Compute a stable hash of a nested structure
+
+  :param obj: structure to hash
+  :param memo: Optional dict used to cache the digests of containers, by identity
+  :returns: hex digest
+
+  Dict keys and set members are hashed in a canonical order, so
+  structures that are equal after `sort_structure` give the same
+  fingerprint, without building the sorted copy.  Values are hashed
+  with their type, so `1`, `1.0` and `True`, or a list and a tuple
+  with the same items, differ.  Leaves other than strings
+  are hashed by `repr`.
+
+  Each container is hashed from the digests of its children.  With
+  `memo`, these digests are remembered by `id`, so containers shared
+  by several structures are only hashed once.  The memo keeps a
+  reference to the containers; it must be discarded if any of them
+  is modified.
+
+  Examples:
+
+  ```{doctest}
+
+  >>> import mypielib.arrayu as arrayu
+  >>> arrayu.fingerprint({'user': {'name': 'Alice', 'age': 30}, 'roles': ['editor', 'admin']})
+  '8775188a0d9e819acbcf1dd8b711fb0c'
+  >>> arrayu.fingerprint({'roles': ['editor', 'admin'], 'user': {'age': 30, 'name': 'Alice'}})
+  '8775188a0d9e819acbcf1dd8b711fb0c'
+  >>> arrayu.fingerprint(['admin', 'editor']) == arrayu.fingerprint(['editor', 'admin'])
+  False
+  >>> arrayu.fingerprint({1, 2}) == arrayu.fingerprint({2, 1})
+  True
+  >>> shared = {'packages': list(range(1000))}
+  >>> memo = {}
+  >>> docs = [{'host': f'web{i}', 'base': shared} for i in range(3)]
+  >>> len({arrayu.fingerprint(doc, memo) for doc in docs})
+  3
+
+  ```
+  '''
+  from hashlib import blake2b
+
+  root = []
+  stack = [(None, '', root, root.append, iter((('', obj),)))]
+  while len(stack):
+    _, _, _, emit, children = stack[-1]
+    for prefix, value in children:
+      if not isinstance(value, CONTAINERS):
+        emit(prefix + _leaf_text(value))
+        continue
+      if memo is not None:
+        cached = memo.get(id(value))
+        if cached is not None and cached[0] is value:
+          emit(prefix + cached[1])
+          continue
+      stack.append(_fingerprint_frame(value, prefix))
+      break
+    else:
+      node, prefix, chunks, _, _ = stack.pop()
+      if len(stack) == 0: break
+      digest = _fingerprint_digest(blake2b, node, chunks)
+      if memo is not None: memo[id(node)] = (node, digest)
+      stack[-1][3](prefix + digest)
+
+  chunk = root[0]
+  if chunk.startswith('#'): return chunk[1:]
+  return blake2b(chunk.encode('utf-8', 'surrogatepass'), digest_size = FINGERPRINT_SIZE).hexdigest()
+
+
+
+PATCH_SET = 'set'
+'''Patch operation: `[PATCH_SET, path, value]`'''
+PATCH_DEL = 'del'
+'''Patch operation: `[PATCH_DEL, path]`'''
+PATCH_SPLICE = 'splice'
+'''Patch operation: `[PATCH_SPLICE, path, start, stop, values]` replaces a slice of a list'''
+
+def _same(old:Any, new:Any, memo:dict|None) -> bool:
+  '''Check if two subtrees are equal, cheapest test first
+
+  Containers are only equal if they are the same object or have the
+  same fingerprint: `==` would treat `True`, `1` and `1.0` as equal.
+  '''
+  if old is new: return True
+  if isinstance(old, CONTAINERS) or isinstance(new, CONTAINERS):
+    return memo is not None and fingerprint(old, memo) == fingerprint(new, memo)
+  return type(old) is type(new) and old == new
+
+def _diff_lists(path:tuple, old:list, new:list, memo:dict|None, stack:list, patch:list):
+  '''Compare two lists for `diff`
+
+  Equal length lists are compared item by item.  Otherwise the
+  items between the common prefix and suffix are replaced.
+  '''
+  if len(old) == len(new):
+    stack.extend(((*path, i), old[i], new[i]) for i in reversed(range(len(old))))
+    return
+  if memo is None: memo = {}  # Compare the items by fingerprint
+  start = 0
+  limit = min(len(old), len(new))
+  while start < limit and _same(old[start], new[start], memo): start += 1
+  end = 0
+  while end < limit - start and _same(old[-1 - end], new[-1 - end], memo): end += 1
+  patch.append([PATCH_SPLICE, list(path), start, len(old) - end, new[start:len(new) - end]])
+
+def diff(old:Any, new:Any, memo:dict|None = None) -> list:
+  '''Compute the changes from one structure to another
+
+  :param old: original structure
+  :param new: updated structure
+  :param memo: Optional `fingerprint` memo, if given subtrees are compared by fingerprint
+  :returns: patch, a list of operations for `apply_patch`
+
+  Dicts are compared key by key and lists item by item, so the
+  patch only contains what changed.  Lists that changed length get
+  the items between their common prefix and suffix replaced.  Any
+  other change replaces the whole value.  Subtrees are skipped if
+  they are the same object, or with a `memo`, if they have the same
+  fingerprint (fast when the fingerprints of the documents are
+  already memoized).  Otherwise they are walked and their leaves
+  compared including their type, so `True` and `1` differ.
+
+  Each operation is a list with the operation name (`PATCH_SET`,
+  `PATCH_DEL` or `PATCH_SPLICE`), the path as a list of keys and
+  indexes, and its arguments.  The patch is JSON serializable if
+  the structures are.  It shares values with `new` instead of
+  copying them.
+
+  Examples:
+
+  ```{doctest}
+
+  >>> import copy, json
+  >>> import mypielib.arrayu as arrayu
+  >>> old = {'version': 1, 'hosts': ['a', 'b', 'c'], 'db': {'port': 5432, 'user': 'app'}}
+  >>> new = {'version': 2, 'hosts': ['a', 'x', 'b', 'c'], 'db': {'port': 5432}}
+  >>> patch = arrayu.diff(old, new)
+  >>> json.dumps(patch)
+  '[["set", ["version"], 2], ["splice", ["hosts"], 1, 1, ["x"]], ["del", ["db", "user"]]]'
+  >>> arrayu.apply_patch(copy.deepcopy(old), json.loads(json.dumps(patch))) == new
+  True
+  >>> arrayu.diff(old, copy.deepcopy(old), {})
+  []
+  >>> arrayu.diff({'d': True, 'f': [1.0]}, {'d': 1, 'f': [1]})
+  [['set', ['d'], 1], ['set', ['f', 0], 1]]
+
+  ```
+  '''
+  patch = []
+  stack = [((), old, new)]
+  while len(stack):
+    path, a, b = stack.pop()
+    if _same(a, b, memo): continue
+    if isinstance(a, dict) and isinstance(b, dict):
+      for key in a:
+        if key not in b: patch.append([PATCH_DEL, [*path, key]])
+      changed = []
+      for key, value in b.items():
+        if key in a:
+          changed.append(((*path, key), a[key], value))
+        else:
+          patch.append([PATCH_SET, [*path, key], value])
+      stack.extend(reversed(changed))  # Visit them in order
+    elif isinstance(a, list) and isinstance(b, list):
+      _diff_lists(path, a, b, memo, stack, patch)
+    else:
+      patch.append([PATCH_SET, list(path), b])
+  return patch
+
+def _resolve(data:Any, path:list) -> Any:
+  '''Get the node at a path'''
+  for key in path: data = data[key]
+  return data
+
+def apply_patch(data:Any, patch:list) -> Any:
+  '''Apply a patch from `diff`
+
+  :param data: structure to update in place
+  :param patch: operations from `diff`
+  :returns: updated structure, a new one only if the root itself was replaced
+
+  Examples:
+
+  ```{doctest}
+
+  >>> import mypielib.arrayu as arrayu
+  >>> data = {'a': [1, 2, 3]}
+  >>> arrayu.apply_patch(data, [['splice', ['a'], 0, 2, [0]], ['set', ['b'], True]])
+  {'a': [0, 3], 'b': True}
+  >>> data
+  {'a': [0, 3], 'b': True}
+  >>> arrayu.apply_patch(data, [['set', [], 'replaced']])
+  'replaced'
+
+  ```
+  '''
+  for op in patch:
+    kind, path = op[0], op[1]
+    if kind == PATCH_SPLICE:
+      _resolve(data, path)[op[2]:op[3]] = op[4]
+    elif kind == PATCH_SET and len(path) == 0:
+      data = op[2]
+    elif kind == PATCH_SET:
+      _resolve(data, path[:-1])[path[-1]] = op[2]
+    elif kind == PATCH_DEL:
+      del _resolve(data, path[:-1])[path[-1]]
+    else:
+      raise ValueError(f'Unknown patch operation {kind}')
+  return data
+
+
+class FlatView(MutableMapping):
+  '''Path indexed view of a nested structure
+
+  :param data: structure to index
+  :param sep: separator for string paths
+
+  The structure is walked once (see `walk`) to build an index from
+  paths to leaves.  Paths are tuples of keys and indexes, or strings
+  with the keys joined by `sep`, e.g. `'db.hosts.0'`.  String paths
+  are ambiguous if keys contain `sep`, use tuples then.
+
+  Leaf lookups are dict lookups.  Looking up a container path
+  returns the subtree, and `prefix` returns the leaves under a
+  path, both in time proportional to the depth and the result.
+
+  Assigning or deleting through the view updates the structure and
+  the index, creating missing intermediate dicts.  Writing below a
+  leaf or past the end of a list raises `KeyError`.  After modifying
+  the structure directly, call `refresh`.
+
+  Examples:
+
+  ```{doctest}
+
+  >>> import mypielib.arrayu as arrayu
+  >>> cfg = {'db': {'hosts': ['db1', 'db2'], 'port': 5432}, 'debug': False}
+  >>> flat = arrayu.FlatView(cfg)
+  >>> flat['db.hosts.1'], flat[('db', 'port')], flat.get('db.user', 'nobody')
+  ('db2', 5432, 'nobody')
+  >>> flat['db.hosts']
+  ['db1', 'db2']
+  >>> flat['db.auth.user'] = 'app'
+  >>> flat['db.hosts'] = ['db3']
+  >>> cfg
+  {'db': {'hosts': ['db3'], 'port': 5432, 'auth': {'user': 'app'}}, 'debug': False}
+  >>> flat.prefix('db.auth')
+  {('db', 'auth', 'user'): 'app'}
+  >>> del flat['debug']
+  >>> sorted(flat.names())
+  ['db.auth.user', 'db.hosts.0', 'db.port']
+  >>> flat = arrayu.FlatView({'l': [1, 2, 3], 'n': 1})
+  >>> flat['l.-1'] = 9
+  >>> flat['l.2'], flat[('l', -1)], len(flat), flat.data
+  (9, 9, 4, {'l': [1, 2, 9], 'n': 1})
+  >>> flat['n.x'] = 2
+  Traceback (most recent call last):
+  KeyError: 'n.x'
+
+  ```
+  '''
+  def __init__(self, data:dict|list, sep:str = '.'):
+    self.data = data
+    self.sep = sep
+    self.refresh()
+
+  def refresh(self):
+    '''Rebuild the index from the structure'''
+    self._leaves = {}
+    self._names = {}
+    self._index((), self.data)
+
+  def _name(self, path:tuple) -> str:
+    return self.sep.join(map(str, path))
+
+  def _index(self, prefix:tuple, node:Any):
+    '''Add the leaves of a subtree to the index'''
+    for path, leaf in walk(node):
+      path = prefix + path
+      self._leaves[path] = leaf
+      self._names[self._name(path)] = path
+
+  def _unindex(self, prefix:tuple, node:Any):
+    '''Remove the leaves of a subtree from the index'''
+    for path, _ in walk(node):
+      path = prefix + path
+      self._leaves.pop(path, None)
+      self._names.pop(self._name(path), None)
+
+  def path(self, key:str|tuple) -> tuple:
+    '''Convert a string path to a tuple
+
+    :param key: path
+    :returns: path as a tuple
+
+    Components under lists and tuples are converted to `int`, and
+    negative indexes to the matching positive ones.
+    '''
+    if isinstance(key, tuple):
+      if key in self._leaves: return key
+      parts = key
+    else:
+      if key in self._names: return self._names[key]
+      parts = key.split(self.sep) if key != '' else ()
+    path = []
+    node = self.data
+    for part in parts:
+      if isinstance(node, (list, tuple)):
+        if isinstance(part, str) and part.lstrip('-').isdigit(): part = int(part)
+        if isinstance(part, int) and -len(node) <= part < 0: part += len(node)
+      path.append(part)
+      node = _child(node, part)
+    return tuple(path)
+
+  def __getitem__(self, key:str|tuple) -> Any:
+    path = self.path(key)
+    if path in self._leaves: return self._leaves[path]
+    node = self.data
+    for part in path:
+      node = _child(node, part, KeyError)
+      if node is KeyError: raise KeyError(key)
+    return node
+
+  def __setitem__(self, key:str|tuple, value:Any):
+    path = self.path(key)
+    if len(path) == 0:
+      self.data = value
+      self.refresh()
+      return
+    parent = self.data
+    for part in path[:-1]:
+      child = _child(parent, part, KeyError)
+      if child is KeyError:
+        if not isinstance(parent, dict): raise KeyError(key)  # Below a leaf or past the end of a list
+        child = parent[part] = {}
+      parent = child
+    if not isinstance(parent, CONTAINERS): raise KeyError(key)
+    old = _child(parent, path[-1], KeyError)
+    if old is not KeyError:
+      self._unindex(path, old)
+    elif isinstance(parent, list):
+      raise KeyError(key)
+    parent[path[-1]] = value
+    self._index(path, value)
+
+  def __delitem__(self, key:str|tuple):
+    path = self.path(key)
+    if len(path) == 0: raise KeyError(key)  # The root can not be deleted
+    parent = self[path[:-1]]
+    if _child(parent, path[-1], KeyError) is KeyError: raise KeyError(key)
+    if isinstance(parent, list):  # Later items move, re-index the list
+      self._unindex(path[:-1], parent)
+      del parent[path[-1]]
+      self._index(path[:-1], parent)
+    else:
+      self._unindex(path, parent[path[-1]])
+      del parent[path[-1]]
+
+  def __contains__(self, key:Any) -> bool:
+    return self.path(key) in self._leaves
+
+  def __iter__(self) -> Iterator[tuple]:
+    return iter(self._leaves)
+
+  def __len__(self) -> int:
+    return len(self._leaves)
+
+  def names(self) -> Iterator[str]:
+    '''Iterate over the leaf paths as strings'''
+    return iter(self._names)
+
+  def prefix(self, key:str|tuple) -> dict:
+    '''Get the leaves under a path
+
+    :param key: path of a container
+    :returns: dict mapping the full paths to the leaves
+    '''
+    path = self.path(key)
+    return {path + sub: leaf for sub, leaf in walk(self[path])}
+
+  def transform(self, callback:Callable[[Any],Any], **kwargs):
+    '''Apply `transform` to the structure and rebuild the index
+
+    :param callback: function to call for each leaf
+    :param kwargs: other `transform` arguments
+    '''
+    transform(self.data, callback, **kwargs)
+    self.refresh()
+
+def _child(node:Any, key:Any, missing:Any = None) -> Any:
+  '''Get an item of a container, or `missing` if it doesn't exist'''
+  if not isinstance(node, CONTAINERS): return missing
+  try:
+    return node[key]
+  except (KeyError, IndexError, TypeError):
+    return missing
+
+
+def _convert(obj:Any, make:Callable[[Any, list],Any], keep:Callable[[Any],bool]) -> Any:
+  '''Rebuild a nested structure bottom up
+
+  :param obj: structure to convert
+  :param make: called with a container and its converted `(key, value)` pairs, returns the new container
+  :param keep: returns True for containers to use as they are
+  :returns: converted structure
+  '''
+  root = []
+  stack = [(None, None, root, iter(((None, obj),)))]
+  while len(stack):
+    _, _, out, children = stack[-1]
+    for key, value in children:
+      if not isinstance(value, CONTAINERS) or keep(value):
+        out.append((key, value))
+      else:
+        stack.append((key, value, [], _children(value)))
+        break
     else:
-      return obj
+      key, node, items, _ = stack.pop()
+      if len(stack): stack[-1][2].append((key, make(node, items)))
+  return root[0][1]
+
+def _make_frozen(node:Any, items:list) -> Any:
+  '''Create the frozen version of a container for `freeze`'''
+  if isinstance(node, MAPPINGS): return FrozenDict(items)
+  values = [value for _, value in items]
+  if isinstance(node, (set, frozenset)): return frozenset(values)
+  if hasattr(node, '_make'): return node._make(values)  # namedtuple
+  return FrozenList(values)
+
+def freeze(obj:Any) -> Any:
+  '''Convert a nested structure to immutable types
+
+  :param obj: structure to convert
+  :returns: frozen structure
 
+  Dicts become `FrozenDict`, lists and tuples `FrozenList`, and
+  sets `frozenset`.  The result is hashable, so it can be used as
+  `functools.lru_cache` key, and it can be shared without copies.
+  `FrozenDict`s and `FrozenList`s are assumed frozen already and
+  are shared, not converted again.
+
+  Examples:
+
+  ```{doctest}
+
+  >>> import mypielib.arrayu as arrayu
+  >>> cfg = arrayu.freeze({'hosts': ['a', 'b'], 'tags': {'x'}, 'db': {'port': 5432}})
+  >>> cfg
+  FrozenDict({'hosts': FrozenList(['a', 'b']), 'tags': frozenset({'x'}), 'db': FrozenDict({'port': 5432})})
+  >>> hash(cfg) == hash(arrayu.freeze({'db': {'port': 5432}, 'tags': {'x'}, 'hosts': ['a', 'b']}))
+  True
+  >>> arrayu.thaw(cfg)
+  {'hosts': ['a', 'b'], 'tags': {'x'}, 'db': {'port': 5432}}
+
+  ```
+  '''
+  return _convert(obj, _make_frozen, lambda node: isinstance(node, (FrozenDict, FrozenList)))
+
+def _make_thawed(node:Any, items:list) -> Any:
+  '''Create the mutable version of a container for `thaw`'''
+  if isinstance(node, MAPPINGS): return dict(items)
+  if isinstance(node, (set, frozenset)): return set(node)  # Members must stay hashable
+  return [value for _, value in items]
+
+def thaw(obj:Any) -> Any:
+  '''Convert a nested structure to mutable types
+
+  :param obj: structure to convert, usually from `freeze`
+  :returns: new structure of dicts, lists and sets
+
+  Mappings become dicts, sequences (including tuples) lists and
+  sets `set`.  Set members are kept as they are, as they must be
+  hashable.  The result is a full copy of the other containers.
+  '''
+  return _convert(obj, _make_thawed, lambda node: False)
 
 
 if __name__ == '__main__':
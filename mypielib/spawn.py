@@ -0,0 +1,146 @@
+'''
+Low overhead process spawning
+
+Starts processes with `os.posix_spawnp` when available, which avoids
+the Python level work done by `subprocess.Popen` and the cost of
+copying page tables when `fork`ing a large parent process.
+
+It falls back to `subprocess.Popen` when `posix_spawnp` is not
+available (Windows) or when pipes need to be created.  Unlike
+`subprocess`, inheritable file descriptors are not closed in the
+child, Python only creates non-inheritable ones by default.
+
+Examples:
+
+```{doctest}
+
+>>> import mypielib.spawn as spawn
+>>> spawn.run(['true'])
+0
+>>> spawn.run(['sh', '-c', 'exit 3'])
+3
+>>> spawn.run(['false'], check = True)
+Traceback (most recent call last):
+subprocess.CalledProcessError: Command '['false']' returned non-zero exit status 1.
+>>> import signal
+>>> signal.getsignal(signal.SIGPIPE) == signal.SIG_IGN   # Python ignores it
+True
+>>> sigpipe_ignored = 'exit $(( 0x$(sed -n "s/^SigIgn:\\t//p" /proc/$$/status) >> 12 & 1 ))'
+>>> spawn.run(['sh', '-c', sigpipe_ignored])   # but not its children
+0
+
+```
+'''
+import os
+import signal
+import subprocess
+
+HAVE_POSIX_SPAWN = hasattr(os, 'posix_spawnp')
+'''True if `os.posix_spawnp` can be used'''
+RESTORE_SIGNALS = tuple(getattr(signal, name) for name in ('SIGPIPE', 'SIGXFSZ') if hasattr(signal, name))
+'''Signals Python ignores that are reset to their default in children, like `subprocess` does'''
+
+class SpawnedProcess:
+  '''Handle for a process started with `os.posix_spawnp`
+
+  :param args: command line
+  :param pid: process id
+
+  Provides the subset of the `subprocess.Popen` interface used
+  in this library.
+  '''
+  def __init__(self, args:list[str], pid:int):
+    self.args = args
+    self.pid = pid
+    self.returncode = None
+    self.stdin = None
+    self.stdout = None
+
+  def __repr__(self) -> str:
+    return f'<SpawnedProcess: returncode: {self.returncode} args: {self.args!r}>'
+
+  def poll(self) -> int|None:
+    '''Check if the process has finished
+
+    :returns: return code, or None if still running
+    '''
+    if self.returncode is None:
+      pid, status = os.waitpid(self.pid, os.WNOHANG)
+      if pid != 0: self.returncode = os.waitstatus_to_exitcode(status)
+    return self.returncode
+
+  def kill(self):
+    '''Send SIGKILL to the process if it is still running'''
+    if self.returncode is None: os.kill(self.pid, signal.SIGKILL)
+
+  def wait(self) -> int:
+    '''Wait for the process to finish
+
+    :returns: return code
+    '''
+    if self.returncode is None:
+      _, status = os.waitpid(self.pid, 0)
+      self.returncode = os.waitstatus_to_exitcode(status)
+    return self.returncode
+
+def _fileno(fh) -> int|None:
+  '''Get the file descriptor of a redirect argument'''
+  if fh is None or isinstance(fh, int): return fh
+  return fh.fileno()
+
+def popen(cmd:list[str], stdin = None, stdout = None) -> SpawnedProcess|subprocess.Popen:
+  '''Start a process
+
+  :param cmd: command to execute, searched in `PATH`
+  :param stdin: file handle or file descriptor for stdin.  None to inherit.
+  :param stdout: file handle or file descriptor for stdout.  None to inherit.
+  :returns: process handle
+
+  Uses `os.posix_spawnp` with `dup2` file actions for the
+  redirects.  As with `subprocess.Popen`, signals ignored by Python
+  (`SIGPIPE`, `SIGXFSZ`) are restored to their default in the child.  If `subprocess.PIPE` or `subprocess.DEVNULL` are
+  requested, or `posix_spawnp` is not available, it uses
+  `subprocess.Popen`.
+  '''
+  if not HAVE_POSIX_SPAWN or stdin in (subprocess.PIPE, subprocess.DEVNULL) \
+        or stdout in (subprocess.PIPE, subprocess.DEVNULL):
+    return subprocess.Popen(cmd, stdin = stdin, stdout = stdout)
+
+  file_actions = []
+  for target, fh in ((0, stdin), (1, stdout)):
+    fd = _fileno(fh)
+    if fd is not None and fd != target:
+      file_actions.append((os.POSIX_SPAWN_DUP2, fd, target))
+  pid = os.posix_spawnp(cmd[0], cmd, os.environ, file_actions = file_actions,
+                       setsigdef = RESTORE_SIGNALS)
+  return SpawnedProcess(cmd, pid)
+
+def run(cmd:list[str], check:bool = False, stdin = None, stdout = None) -> int:
+  '''Run a command and wait for it
+
+  :param cmd: command to execute, searched in `PATH`
+  :param check: If True, raise `subprocess.CalledProcessError` on a non-zero return code
+  :param stdin: file handle or file descriptor for stdin.  None to inherit.
+  :param stdout: file handle or file descriptor for stdout.  None to inherit.
+  :returns: return code
+
+  As with `subprocess.run`, the process is killed and reaped if
+  waiting is interrupted, e.g. by `KeyboardInterrupt`.
+  '''
+  proc = popen(cmd, stdin, stdout)
+  try:
+    returncode = proc.wait()
+  except BaseException:
+    proc.kill()
+    proc.wait()
+    raise
+  if check and returncode:
+    raise subprocess.CalledProcessError(returncode, cmd)
+  return returncode
+
+if __name__ == '__main__':
+  import doctest
+  import sys
+  sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../'))
+  failures, tests = doctest.testmod()
+  print(f'Failures: {failures} of {tests} tests')
@@ -7,7 +7,17 @@ It defines two values:
 - `SETUP_VERSION` : version string suitable for `setuptools`
    If the version string doesn't match `setuptools` rules, then
    it is set to `None`.
+
+The version is looked up in this order:
+
+1. `_version.py`, generated by `setup.py` when building a package,
+   or by `windows/github-meta.py` in the release workflows.
+2. The release tag when running in a GitHub tag workflow.
+3. `git describe`.  The result is cached in the `.git` directory,
+   keyed on the modification times of `HEAD`, the ref it points to
+   and the tags, so it only runs when those change.
 '''
+import json
 import os
 import sys
 import subprocess
@@ -22,20 +32,84 @@ try:
 except ImportError:
   VCHECK = False
 
-def _get_git_description() -> str:
-  '''use `git describe` to get version info
+CACHE_FILE = 'mypielib-version.json'
+'''Name of the `git describe` cache file in the `.git` directory'''
 
-  :returns: string with version info or None on error
+def _get_baked_version() -> str|None:
+  '''Version baked into `_version.py` at build time
 
-  This is in-line here because we do not want dependancies.
+  :returns: version string or None if not available
   '''
-  # Get the directory where this script is located
-  if 'tag' == os.getenv('GITHUB_REF_TYPE','unknown'):
-    env = os.getenv('GITHUB_REF_NAME',None)
-    if env: return env
+  try:
+    from mypielib._version import VERSION as baked
+  except ImportError:
+    return None
+  return baked
 
-  script_dir = os.path.dirname(os.path.abspath(__file__))
+def _find_git_dir(path:str) -> str|None:
+  '''Find the git directory for a checkout containing `path`
 
+  :param path: directory to start looking from
+  :returns: path to the git directory or None
+  '''
+  while True:
+    git_dir = os.path.join(path, '.git')
+    if os.path.isdir(git_dir): return git_dir
+    if os.path.isfile(git_dir):
+      # Work trees and submodules use a `gitdir:` pointer file
+      with open(git_dir, 'r') as fp:
+        line = fp.read().strip()
+      if not line.startswith('gitdir:'): return None
+      return os.path.join(path, line[7:].strip())
+    parent = os.path.dirname(path)
+    if parent == path: return None
+    path = parent
+
+def _git_common_dir(git_dir:str) -> str:
+  '''Find the directory holding the shared refs of a git directory
+
+  :param git_dir: git directory
+  :returns: the `commondir` of a work tree, else `git_dir`
+  '''
+  try:
+    with open(os.path.join(git_dir, 'commondir'), 'r') as fp:
+      common = fp.read().strip()
+  except OSError:
+    return git_dir
+  return os.path.normpath(os.path.join(git_dir, common)) if common else git_dir
+
+def _git_cache_key(git_dir:str) -> list:
+  '''Compute the cache key for `git describe` results
+
+  :param git_dir: git directory
+  :returns: list of `[path, mtime_ns]` pairs
+
+  `HEAD` is per work tree, branches and tags are looked up in
+  the common directory shared by all work trees.
+  '''
+  head = os.path.join(git_dir, 'HEAD')
+  common_dir = _git_common_dir(git_dir)
+  paths = [ head, os.path.join(common_dir, 'packed-refs'), os.path.join(common_dir, 'refs', 'tags') ]
+  try:
+    with open(head, 'r') as fp:
+      ref = fp.read().strip()
+  except OSError:
+    ref = ''
+  if ref.startswith('ref:'): paths.append(os.path.join(common_dir, ref[4:].strip()))
+  key = []
+  for path in paths:
+    try:
+      key.append([path, os.stat(path).st_mtime_ns])
+    except OSError:
+      key.append([path, None])
+  return key
+
+def _git_describe(script_dir:str) -> str:
+  '''use `git describe` to get version info
+
+  :param script_dir: directory to run git from
+  :returns: string with version info
+  '''
   # Run the command with subprocess.run in the script's directory
   result = subprocess.run(
         ['git', 'describe'],
@@ -61,6 +135,53 @@ def _get_git_description() -> str:
 
   return '$unknown$'
 
+def _cached_git_describe(script_dir:str, git_dir:str) -> str:
+  '''Run `git describe` unless a cached result is still valid
+
+  :param script_dir: directory to run git from
+  :param git_dir: git directory, where the cache is kept
+  :returns: string with version info
+
+  Errors reading or writing the cache are ignored.
+  '''
+  cache_file = os.path.join(git_dir, CACHE_FILE)
+  key = _git_cache_key(git_dir)
+  try:
+    with open(cache_file, 'r') as fp:
+      cache = json.load(fp)
+    if cache['key'] == key: return cache['version']
+  except (OSError, ValueError, KeyError, TypeError):
+    pass
+
+  version = _git_describe(script_dir)
+  try:
+    with open(cache_file + '.tmp', 'w') as fp:
+      json.dump({'key': key, 'version': version}, fp)
+    os.replace(cache_file + '.tmp', cache_file)
+  except OSError:
+    pass
+  return version
+
+def _get_git_description() -> str:
+  '''Get the version information
+
+  :returns: string with version info
+
+  This is in-line here because we do not want dependancies.
+  '''
+  baked = _get_baked_version()
+  if baked is not None: return baked
+
+  if 'tag' == os.getenv('GITHUB_REF_TYPE','unknown'):
+    env = os.getenv('GITHUB_REF_NAME',None)
+    if env: return env
+
+  # Get the directory where this script is located
+  script_dir = os.path.dirname(os.path.abspath(__file__))
+  git_dir = _find_git_dir(script_dir)
+  if git_dir is None: return '$unknown$'
+  return _cached_git_describe(script_dir, git_dir)
+
 VERSION = _get_git_description()
 '''git based version'''
 if VCHECK:
@@ -1,12 +1,34 @@
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
+from setuptools.command.sdist import sdist
 import os
 os.environ['IN_SETUPTOOLS'] = 'yes'
-from mypielib.version import SETUP_VERSION
+from mypielib.version import VERSION, SETUP_VERSION
+
+def write_version(pkgdir):
+  '''Bake the version into the package so it does not need git'''
+  with open(os.path.join(pkgdir, '_version.py'), 'w') as fp:
+    fp.write('# Generated by setup.py\n')
+    fp.write(f'VERSION = {VERSION!r}\n')
+
+class BuildPyCommand(build_py):
+  def run(self):
+    super().run()
+    if not self.dry_run: write_version(os.path.join(self.build_lib, 'mypielib'))
+
+class SdistCommand(sdist):
+  def make_release_tree(self, base_dir, files):
+    super().make_release_tree(base_dir, files)
+    if not self.dry_run: write_version(os.path.join(base_dir, 'mypielib'))
 
 setup(
     name="mypielib",
     version=SETUP_VERSION,
     packages=find_packages(),
+    cmdclass={
+        'build_py': BuildPyCommand,
+        'sdist': SdistCommand,
+    },
     install_requires=[
         # Add any dependencies your library needs here
     ],
@@ -121,25 +121,24 @@ def main():
   output_lines['PKGID'] = pkgid
   output_lines['PKGVER'] = pkgver
 
-  text = 'VERSION = "{version}"\nSETUP_VERSION = {setup}\n'.format(
-                version = pkgver,
-                setup = f"'{pkgver}'" if is_valid else 'None'
-                )
+  # Baked into _version.py, which version.py reads first and setup.py
+  # writes again into the built packages.  See docs/devnotes.md
+  text = f'# Generated by windows/github-meta.py\nVERSION = {pkgver!r}\n'
 
-  print('+++ version.py')
+  print('+++ _version.py')
   print('==============================')
   print(text)
   print('==============================')
   if os.path.isfile(f'{pkgname}/version.py'):
     wrversion = os.getenv('WRITE_VERSION', None)
     if wrversion is None:
-      sys.stderr.write(f'Setenv WRITE_VERSION to "1" to write to {pkgname}/version.py\n')
+      sys.stderr.write(f'Setenv WRITE_VERSION to "1" to write to {pkgname}/_version.py\n')
     elif wrversion  == '1':
-      sys.stderr.write(f'Updating {pkgname}/version.py\n')
-      with open(f'{pkgname}/version.py','w') as fp:
+      sys.stderr.write(f'Updating {pkgname}/_version.py\n')
+      with open(f'{pkgname}/_version.py','w') as fp:
         fp.write(text)
     else:
-      sys.stderr.write(f'WRITE_VERSION is not set to "1" will not write to  {pkgname}/version.py\n')
+      sys.stderr.write(f'WRITE_VERSION is not set to "1" will not write to  {pkgname}/_version.py\n')
   else:
     sys.stderr.write(f'{pkgname}/version.py: file does not exist!\n')
   